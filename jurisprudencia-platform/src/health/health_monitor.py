@@ -91,6 +91,10 @@ class HealthMonitor:
             except asyncio.CancelledError:
                 pass
         
+        # Enviar agrupados e gravar logs pendentes antes de sair
+        if self.notification_service:
+            await self.notification_service.close()
+        
         logger.info("Monitor de saúde parado")
     
     async def _monitor_loop(self):
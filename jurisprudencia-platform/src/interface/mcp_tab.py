@@ -352,8 +352,11 @@ def render_pdf_processing(pdf_processor):
                         
                         for i, match in enumerate(search_results['matches']):
                             with st.expander(f"📄 Página {match['page']} - Ocorrência {i+1}"):
-                                st.markdown(f"**Contexto:**")
-                                st.text(match['context'])
+                                if 'context' in match:
+                                    st.markdown(f"**Contexto:**")
+                                    st.text(match['context'])
+                                else:
+                                    st.caption(f"Posição {match['position']} na página")
                     else:
                         st.warning(f"❌ Termo '{search_term}' não encontrado")
                 else:
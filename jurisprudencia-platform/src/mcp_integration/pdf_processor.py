@@ -4,10 +4,168 @@ Funcionalidade EXTRA opcional para PDFs
 """
 
 import os
+import re
+import mmap
+import unicodedata
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 import base64
 
+# PyPDF2 é opcional: verificado uma única vez na importação do módulo
+try:
+    import PyPDF2
+    PYPDF2_AVAILABLE = True
+except ImportError:
+    PyPDF2 = None
+    PYPDF2_AVAILABLE = False
+
+
+def _normalize_text(text: str) -> str:
+    """Minúsculas, sem acentos e com espaços colapsados (para busca de termos)"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = text.encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'\s+', ' ', text)
+
+
+_LEGAL_TERMS = (
+    'dano moral', 'dano material', 'indenização', 'responsabilidade civil',
+    'nexo causal', 'culpa', 'dolo', 'boa-fé', 'má-fé',
+    'código de defesa do consumidor', 'cdc', 'direito do consumidor',
+    'negativação', 'serasa', 'spc', 'cadastro de inadimplentes',
+    'juros', 'correção monetária', 'honorários advocatícios'
+)
+
+# Termos já normalizados, calculados uma única vez
+_LEGAL_TERMS_NORMALIZED = tuple((term, _normalize_text(term)) for term in _LEGAL_TERMS)
+
+# Padrões de extração jurídica, compilados uma única vez
+_PROCESS_NUMBER_PATTERNS = (
+    re.compile(r'\d{7}-\d{2}\.\d{4}\.\d\.\d{2}\.\d{4}'),  # Formato CNJ
+    re.compile(r'\d{7}-\d{2}\.\d{4}\.\d{1}\.\d{2}\.\d{4}'),  # Variação
+    re.compile(r'\d{4}\.\d{3}\.\d{3}-\d{1}'),  # Formato mais antigo
+)
+
+_MONETARY_PATTERNS = (
+    re.compile(r'R\$\s?[\d.,]+', re.IGNORECASE),
+    re.compile(r'reais?\s+de\s+R\$\s?[\d.,]+', re.IGNORECASE),
+    re.compile(r'valor\s+de\s+R\$\s?[\d.,]+', re.IGNORECASE),
+)
+
+_DATE_PATTERNS = (
+    re.compile(r'\d{1,2}[/.-]\d{1,2}[/.-]\d{4}'),
+    re.compile(r'\d{1,2}\s+de\s+\w+\s+de\s+\d{4}'),
+)
+
+# Partes do processo: as palavras-chave são localizadas numa única passada e o
+# nome é lido numa janela limitada antes/depois delas (sem backtracking)
+_PARTY_NAME_MAX_LENGTH = 150
+_PARTY_KEYWORD_RE = re.compile(
+    r'(autor|requerente|apelante)|(réu|requerido|apelado)', re.IGNORECASE
+)
+_PARTY_LABEL_RE = re.compile(r':\s*([^\n,]{1,%d})' % _PARTY_NAME_MAX_LENGTH)
+_PARTY_TRAILING_KEYWORDS = frozenset({'autor', 'requerente', 'réu', 'requerido'})
+
+# Páginas cujo content stream (já descomprimido) passa deste tamanho costumam
+# ser dominadas por operadores gráficos; nelas lemos apenas os operadores de
+# texto (Tj/TJ/'), desde que as strings possam ser lidas diretamente
+_HEAVY_CONTENT_STREAM_BYTES = 1_000_000
+
+# Strings hexadecimais (<...>), usadas por fontes CID/Identity-H: a varredura
+# rápida não as decodifica
+_HEX_STRING_RE = re.compile(rb'(?<!<)<[0-9A-Fa-f\s]+>(?!>)')
+
+# Codificações em que o byte da string literal já é o caractere
+_STANDARD_ENCODINGS = frozenset({'/StandardEncoding', '/WinAnsiEncoding', '/MacRomanEncoding'})
+_SIMPLE_FONT_SUBTYPES = frozenset({'/Type1', '/TrueType', '/MMType1'})
+# Fontes padrão (sem Symbol/ZapfDingbats) cuja codificação embutida é a StandardEncoding
+_STANDARD_TEXT_FONTS = frozenset({
+    '/Helvetica', '/Helvetica-Bold', '/Helvetica-Oblique', '/Helvetica-BoldOblique',
+    '/Times-Roman', '/Times-Bold', '/Times-Italic', '/Times-BoldItalic',
+    '/Courier', '/Courier-Bold', '/Courier-Oblique', '/Courier-BoldOblique'
+})
+
+_TEXT_OPERATOR_RE = re.compile(
+    rb"\(((?:\\.|[^\\)])*)\)\s*(?:Tj|')|\[((?:\\.|[^\]])*)\]\s*TJ",
+    re.DOTALL
+)
+_PDF_STRING_RE = re.compile(rb'\(((?:\\.|[^\\)])*)\)', re.DOTALL)
+_PDF_ESCAPE_RE = re.compile(rb'\\([0-7]{1,3}|.)', re.DOTALL)
+_PDF_ESCAPES = {
+    b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f',
+    b'\n': b'', b'\r': b''  # continuação de linha
+}
+
+
+def _unescape_pdf_string(raw: bytes) -> str:
+    """Decodificar uma string literal de PDF (escapes + PDFDocEncoding aproximado)"""
+    def _replace(match):
+        seq = match.group(1)
+        if b'0' <= seq[:1] <= b'7':
+            return bytes([int(seq, 8) & 0xFF])
+        return _PDF_ESCAPES.get(seq, seq)
+    
+    return _PDF_ESCAPE_RE.sub(_replace, raw).decode('latin-1')
+
+
+def _content_streams(page) -> list:
+    """Streams do /Contents da página (um único stream ou um array deles)"""
+    contents = page.get_contents()
+    if contents is None:
+        return []
+    if isinstance(contents, list):
+        return [stream.get_object() for stream in contents]
+    return [contents]
+
+
+def _has_plain_fonts(page) -> bool:
+    """
+    Verificar se o texto da página pode ser lido direto das strings literais:
+    só fontes simples com codificação padrão e nenhum Form XObject (cujo texto
+    a varredura dos operadores da página não alcança)
+    """
+    resources = page.get('/Resources')
+    if resources is None:
+        # Recursos herdados ou ausentes: não dá para verificar as fontes
+        return False
+    resources = resources.get_object()
+    
+    xobjects = resources.get('/XObject')
+    if xobjects is not None:
+        for xobject in xobjects.get_object().values():
+            if xobject.get_object().get('/Subtype') == '/Form':
+                return False
+    
+    fonts = resources.get('/Font')
+    for font in (fonts.get_object().values() if fonts is not None else ()):
+        font = font.get_object()
+        if font.get('/Subtype') not in _SIMPLE_FONT_SUBTYPES:
+            return False
+        encoding = font.get('/Encoding')
+        if encoding is None:
+            if font.get('/BaseFont') not in _STANDARD_TEXT_FONTS:
+                return False
+        elif not isinstance(encoding, str) or encoding not in _STANDARD_ENCODINGS:
+            # Inclui dicionários de /Differences
+            return False
+    
+    return True
+
+
+def _extract_text_operators(content: bytes) -> str:
+    """Extração rápida: varre só os operadores de texto do content stream"""
+    runs = []
+    for match in _TEXT_OPERATOR_RE.finditer(content):
+        if match.group(1) is not None:
+            runs.append(_unescape_pdf_string(match.group(1)))
+        else:
+            runs.append(''.join(
+                _unescape_pdf_string(part)
+                for part in _PDF_STRING_RE.findall(match.group(2))
+            ))
+    return ' '.join(runs)
+
+
 class PDFProcessor:
     """
     Processador de PDFs com funcionalidades extras
@@ -21,14 +179,55 @@ class PDFProcessor:
     
     def _check_pdf_support(self) -> bool:
         """Verificar se bibliotecas PDF estão disponíveis"""
-        try:
-            import PyPDF2
-            return True
-        except ImportError:
-            return False
+        return PYPDF2_AVAILABLE
+    
+    @contextmanager
+    def _open_pdf(self, pdf_path: Path):
+        """Abrir PDF mapeado em memória (o SO só carrega as páginas acessadas)"""
+        with open(pdf_path, 'rb') as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as pdf_map:
+            yield PyPDF2.PdfReader(pdf_map)
+    
+    def _iter_page_texts(self, pdf_reader) -> Iterator[Tuple[int, str]]:
+        """Gerar (número da página, texto) para cada página com conteúdo"""
+        for page_num, page in enumerate(pdf_reader.pages):
+            try:
+                content = None
+                try:
+                    # get_data() guarda o conteúdo decodificado no objeto, então
+                    # extract_text não descomprime a página de novo
+                    streams = _content_streams(page)
+                    datas = [stream.get_data() for stream in streams]
+                    if sum(len(data) for data in datas) > _HEAVY_CONTENT_STREAM_BYTES:
+                        content = b'\n'.join(datas)
+                        if _HEX_STRING_RE.search(content) or not _has_plain_fonts(page):
+                            content = None
+                except Exception:
+                    # Estrutura inesperada: deixar a extração padrão decidir
+                    content = None
+                
+                if content is not None:
+                    page_text = _extract_text_operators(content)
+                else:
+                    page_text = page.extract_text()
+                page_text = page_text.strip()
+                if page_text:
+                    yield page_num + 1, page_text
+            except Exception as e:
+                yield page_num + 1, f'[Erro na página {page_num + 1}: {str(e)}]'
+    
+    @staticmethod
+    def total_text(result: Dict) -> str:
+        """Texto completo de um resultado de extract_text_simple (páginas unidas)"""
+        return '\n\n'.join(result['texts'])
     
     def extract_text_simple(self, pdf_path: Path) -> Dict:
-        """Extração simples de texto de PDF"""
+        """
+        Extração simples de texto de PDF
+        
+        O texto vem por página ('pages'/'texts'); o texto completo é montado
+        só quando preciso, com total_text(result).
+        """
         if not self.pdf_available:
             return {
                 'success': False,
@@ -37,42 +236,32 @@ class PDFProcessor:
             }
         
         try:
-            import PyPDF2
-            
-            text_content = []
+            # Páginas e textos em listas paralelas (evita um dict por página)
+            pages = []
+            texts = []
             metadata = {}
             
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                # Metadados
+            with self._open_pdf(pdf_path) as pdf_reader:
+                # Metadados (pdf_reader.metadata é lido uma única vez)
+                pdf_metadata = pdf_reader.metadata or {}
                 metadata = {
                     'pages': len(pdf_reader.pages),
-                    'title': pdf_reader.metadata.get('/Title', '') if pdf_reader.metadata else '',
-                    'author': pdf_reader.metadata.get('/Author', '') if pdf_reader.metadata else '',
+                    'title': pdf_metadata.get('/Title', ''),
+                    'author': pdf_metadata.get('/Author', ''),
                     'size': pdf_path.stat().st_size
                 }
                 
                 # Extrair texto de cada página
-                for page_num, page in enumerate(pdf_reader.pages):
-                    try:
-                        page_text = page.extract_text()
-                        if page_text.strip():
-                            text_content.append({
-                                'page': page_num + 1,
-                                'text': page_text.strip()
-                            })
-                    except Exception as e:
-                        text_content.append({
-                            'page': page_num + 1,
-                            'text': f'[Erro na página {page_num + 1}: {str(e)}]'
-                        })
+                for page_num, page_text in self._iter_page_texts(pdf_reader):
+                    pages.append(page_num)
+                    texts.append(page_text)
             
+            # Sem o texto completo: search_in_pdf não precisa dele
             return {
                 'success': True,
                 'metadata': metadata,
-                'text_content': text_content,
-                'total_text': '\n\n'.join([p['text'] for p in text_content])
+                'pages': pages,
+                'texts': texts
             }
             
         except Exception as e:
@@ -90,20 +279,28 @@ class PDFProcessor:
             return result
         
         # Criar preview
-        preview_text = result['total_text'][:max_chars]
-        if len(result['total_text']) > max_chars:
+        total_text = self.total_text(result)
+        preview_text = total_text[:max_chars]
+        if len(total_text) > max_chars:
             preview_text += "\n\n[... texto truncado ...]"
         
         return {
             'success': True,
             'preview': preview_text,
             'metadata': result['metadata'],
-            'has_more': len(result['total_text']) > max_chars,
-            'total_length': len(result['total_text'])
+            'has_more': len(total_text) > max_chars,
+            'total_length': len(total_text)
         }
     
-    def search_in_pdf(self, pdf_path: Path, search_term: str) -> Dict:
-        """Buscar termo específico no PDF"""
+    def search_in_pdf(self, pdf_path: Path, search_term: str,
+                      max_contexts: Optional[int] = 20) -> Dict:
+        """
+        Buscar termo específico no PDF
+        
+        Cada ocorrência traz o intervalo ('span') do contexto na página; o texto
+        do contexto só é materializado para as primeiras `max_contexts`
+        ocorrências (None = todas).
+        """
         result = self.extract_text_simple(pdf_path)
         
         if not result['success']:
@@ -112,22 +309,22 @@ class PDFProcessor:
         matches = []
         search_term_lower = search_term.lower()
         
-        for page_data in result['text_content']:
-            page_text = page_data['text']
-            page_text_lower = page_text.lower()
+        for page, page_text in zip(result['pages'], result['texts']):
+            pos = page_text.lower().find(search_term_lower)
             
-            if search_term_lower in page_text_lower:
-                # Encontrar contexto ao redor da palavra
-                pos = page_text_lower.find(search_term_lower)
+            if pos != -1:
+                # Intervalo do contexto ao redor da palavra
                 start = max(0, pos - 100)
                 end = min(len(page_text), pos + len(search_term) + 100)
-                context = page_text[start:end]
-                
-                matches.append({
-                    'page': page_data['page'],
-                    'context': context,
+                match = {
+                    'page': page,
+                    'span': (start, end),
                     'position': pos
-                })
+                }
+                if max_contexts is None or len(matches) < max_contexts:
+                    match['context'] = page_text[start:end]
+                
+                matches.append(match)
         
         return {
             'success': True,
@@ -143,14 +340,16 @@ class PDFProcessor:
         if not result['success']:
             return result
         
-        text = result['total_text']
+        text = self.total_text(result)
+        # Normalizar uma única vez para todas as buscas de termos
+        text_norm = _normalize_text(text)
         
         legal_info = {
             'numeros_processo': self._extract_process_numbers(text),
             'valores_monetarios': self._extract_monetary_values(text),
             'datas_importantes': self._extract_dates(text),
             'partes_processo': self._extract_parties(text),
-            'termos_juridicos': self._extract_legal_terms(text)
+            'termos_juridicos': self._extract_legal_terms(text, text_norm)
         }
         
         return {
@@ -161,133 +360,99 @@ class PDFProcessor:
     
     def _extract_process_numbers(self, text: str) -> List[str]:
         """Extrair números de processo"""
-        import re
-        
-        patterns = [
-            r'\d{7}-\d{2}\.\d{4}\.\d\.\d{2}\.\d{4}',  # Formato CNJ
-            r'\d{7}-\d{2}\.\d{4}\.\d{1}\.\d{2}\.\d{4}',  # Variação
-            r'\d{4}\.\d{3}\.\d{3}-\d{1}',  # Formato mais antigo
-        ]
-        
-        numbers = []
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            numbers.extend(matches)
-        
-        return list(set(numbers))  # Remover duplicatas
+        # Remover duplicatas preservando a ordem de ocorrência
+        return list(dict.fromkeys(
+            match.group(0) for pattern in _PROCESS_NUMBER_PATTERNS
+            for match in pattern.finditer(text)
+        ))
     
     def _extract_monetary_values(self, text: str) -> List[str]:
         """Extrair valores monetários"""
-        import re
-        
-        patterns = [
-            r'R\$\s?[\d.,]+',
-            r'reais?\s+de\s+R\$\s?[\d.,]+',
-            r'valor\s+de\s+R\$\s?[\d.,]+',
-        ]
-        
-        values = []
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            values.extend(matches)
-        
-        return list(set(values))
+        return list(dict.fromkeys(
+            match.group(0) for pattern in _MONETARY_PATTERNS
+            for match in pattern.finditer(text)
+        ))
     
     def _extract_dates(self, text: str) -> List[str]:
         """Extrair datas importantes"""
-        import re
-        
-        patterns = [
-            r'\d{1,2}[/.-]\d{1,2}[/.-]\d{4}',
-            r'\d{1,2}\s+de\s+\w+\s+de\s+\d{4}',
-        ]
-        
-        dates = []
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            dates.extend(matches)
-        
-        return list(set(dates))
+        return list(dict.fromkeys(
+            match.group(0) for pattern in _DATE_PATTERNS
+            for match in pattern.finditer(text)
+        ))
     
     def _extract_parties(self, text: str) -> Dict[str, List[str]]:
-        """Extrair partes do processo"""
-        import re
-        
+        """Extrair partes do processo (varredura única pelas palavras-chave)"""
         parties = {'autores': [], 'reus': []}
         
-        # Buscar padrões típicos
-        autor_patterns = [
-            r'(?:Autor|Requerente|Apelante):\s*([^\n,]+)',
-            r'([^,\n]+)\s*(?:autor|requerente)',
-        ]
-        
-        reu_patterns = [
-            r'(?:Réu|Requerido|Apelado):\s*([^\n,]+)',
-            r'([^,\n]+)\s*(?:réu|requerido)',
-        ]
-        
-        for pattern in autor_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            parties['autores'].extend([m.strip() for m in matches])
-        
-        for pattern in reu_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            parties['reus'].extend([m.strip() for m in matches])
+        for match in _PARTY_KEYWORD_RE.finditer(text):
+            role = 'autores' if match.group(1) else 'reus'
+            
+            # "Autor: Fulano" -> nome depois do rótulo
+            label = _PARTY_LABEL_RE.match(text, match.end())
+            if label:
+                parties[role].append(label.group(1).strip())
+            
+            # "Fulano, autor" -> nome antes da palavra-chave, na mesma linha/cláusula
+            if match.group(0).lower() in _PARTY_TRAILING_KEYWORDS:
+                start = match.start()
+                window = text[max(0, start - _PARTY_NAME_MAX_LENGTH):start]
+                name = window[max(window.rfind('\n'), window.rfind(',')) + 1:].strip()
+                if name:
+                    parties[role].append(name)
         
         return parties
     
-    def _extract_legal_terms(self, text: str) -> List[str]:
-        """Extrair termos jurídicos relevantes"""
-        terms = [
-            'dano moral', 'dano material', 'indenização', 'responsabilidade civil',
-            'nexo causal', 'culpa', 'dolo', 'boa-fé', 'má-fé',
-            'código de defesa do consumidor', 'cdc', 'direito do consumidor',
-            'negativação', 'serasa', 'spc', 'cadastro de inadimplentes',
-            'juros', 'correção monetária', 'honorários advocatícios'
-        ]
-        
-        found_terms = []
-        text_lower = text.lower()
-        
-        for term in terms:
-            if term.lower() in text_lower:
-                found_terms.append(term)
+    def _extract_legal_terms(self, text: str, text_norm: Optional[str] = None) -> List[str]:
+        """Extrair termos jurídicos relevantes (sem diferenciar acentos)"""
+        if text_norm is None:
+            text_norm = _normalize_text(text)
         
-        return found_terms
+        return [term for term, term_norm in _LEGAL_TERMS_NORMALIZED if term_norm in text_norm]
     
     def convert_pdf_to_text_file(self, pdf_path: Path, output_dir: Path = None) -> Dict:
-        """Converter PDF para arquivo de texto"""
+        """Converter PDF para arquivo de texto (escrita página a página)"""
+        if not self.pdf_available:
+            return {
+                'success': False,
+                'error': 'PyPDF2 não instalado',
+                'message': 'Execute: pip install PyPDF2'
+            }
+        
         if not output_dir:
             output_dir = self.cache_dir
         
-        result = self.extract_text_simple(pdf_path)
-        
-        if not result['success']:
-            return result
-        
         try:
             # Definir arquivo de saída
             output_file = output_dir / f"{pdf_path.stem}.txt"
+            text_length = 0
             
-            # Escrever texto
-            with open(output_file, 'w', encoding='utf-8') as f:
+            # Escrever texto direto do iterador de páginas, sem montar o texto
+            # completo em memória
+            with self._open_pdf(pdf_path) as pdf_reader, \
+                    open(output_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
                 f.write(f"# Texto extraído de: {pdf_path.name}\n")
-                f.write(f"# Páginas: {result['metadata']['pages']}\n")
-                f.write(f"# Data de extração: {result.get('extraction_date', 'N/A')}\n\n")
-                f.write(result['total_text'])
+                f.write(f"# Páginas: {len(pdf_reader.pages)}\n")
+                f.write("# Data de extração: N/A\n\n")
+                
+                separator = ''
+                for _, page_text in self._iter_page_texts(pdf_reader):
+                    f.write(separator)
+                    f.write(page_text)
+                    text_length += len(separator) + len(page_text)
+                    separator = '\n\n'
             
             return {
                 'success': True,
                 'output_file': str(output_file),
                 'original_pdf': str(pdf_path),
-                'text_length': len(result['total_text'])
+                'text_length': text_length
             }
             
         except Exception as e:
             return {
                 'success': False,
                 'error': str(e),
-                'message': 'Erro ao salvar arquivo de texto'
+                'message': f'Erro ao converter PDF: {str(e)}'
             }
     
     def get_installation_instructions(self) -> str:
@@ -1,29 +1,33 @@
 """
 Sistema de monitoramento e observabilidade
+
+Os submódulos são importados sob demanda (PEP 562): ``import monitoring`` não
+carrega prometheus_client nem a configuração de logging até que um dos nomes
+abaixo seja acessado.
 """
 
-from .metrics import (
-    metrics_collector,
-    track_http_requests,
-    track_database_queries,
-    track_search_requests,
-    track_celery_tasks,
-    track_pdf_processing
-)
-
-from .logging_config import (
-    setup_logging,
-    setup_default_logging,
-    get_logger,
-    log_with_context,
-    request_logger,
-    task_logger
-)
+import importlib
+
+# Nome exportado -> submódulo que o define
+_LAZY = {
+    'metrics_collector': 'metrics',
+    'track_http_requests': 'metrics',
+    'track_database_queries': 'metrics',
+    'track_search_requests': 'metrics',
+    'track_celery_tasks': 'metrics',
+    'track_pdf_processing': 'metrics',
+    'setup_logging': 'logging_config',
+    'setup_default_logging': 'logging_config',
+    'get_logger': 'logging_config',
+    'log_with_context': 'logging_config',
+    'request_logger': 'logging_config',
+    'task_logger': 'logging_config'
+}
 
 __all__ = [
     'metrics_collector',
     'track_http_requests',
-    'track_database_queries', 
+    'track_database_queries',
     'track_search_requests',
     'track_celery_tasks',
     'track_pdf_processing',
@@ -33,4 +37,20 @@ __all__ = [
     'log_with_context',
     'request_logger',
     'task_logger'
-]
\ No newline at end of file
+]
+
+
+def __getattr__(name):
+    """Importa o submódulo no primeiro acesso e guarda o nome no pacote"""
+    try:
+        module_name = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -2,20 +2,97 @@
 Configuração centralizada de logging
 """
 
+import atexit
+import copy
 import logging
 import logging.handlers
 import json
 import os
-from datetime import datetime
+import queue
+import time
 from typing import Dict, Any
 
+# orjson (opcional) serializa os registros bem mais rápido que o json da stdlib
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _dumps(data: Dict[str, Any]) -> str:
+    """Serializa o registro de log em JSON (UTF-8, sem escapar acentos)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(data, ensure_ascii=False)
+
+
+def _dumps_bytes(data: Dict[str, Any]) -> bytes:
+    """Serializa o registro de log direto em bytes UTF-8 (sem str intermediária com orjson)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+def _is_utf8(encoding: str) -> bool:
+    """Se o nome de encoding (utf-8, UTF8, utf_8...) é UTF-8"""
+    return (encoding or '').lower().replace('-', '').replace('_', '') == 'utf8'
+
+
+# Campos fixos do processo, lidos do ambiente uma única vez
+_BASE_FIELDS = {
+    'service': os.getenv('SERVICE_NAME', 'jurisprudencia-api'),
+    'environment': os.getenv('ENVIRONMENT', 'development'),
+    'version': os.getenv('APP_VERSION', '1.0.0')
+}
+
+
+# Nomes de nível (maiúsculos ou minúsculos) -> constante do logging
+_LEVEL_MAP = {
+    name: getattr(logging, name)
+    for name in ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+}
+_LEVEL_MAP.update({name.lower(): value for name, value in list(_LEVEL_MAP.items())})
+
+
+def _resolve_level(level: str) -> int:
+    """
+    Constante do logging para o nome do nível. Fora dos nomes mais comuns
+    (WARN, FATAL, 'Warning', níveis registrados com addLevelName...) consulta
+    o logging e guarda o resultado; nome desconhecido gera ValueError
+    """
+    numeric_level = _LEVEL_MAP.get(level)
+    if numeric_level is None:
+        numeric_level = logging.getLevelName(level.upper())
+        if not isinstance(numeric_level, int):
+            raise ValueError(f"Nível de log desconhecido: {level!r}")
+        _LEVEL_MAP[level] = numeric_level
+    return numeric_level
+
+
+def _timestamp(created: float) -> str:
+    """Instante de criação do record em ISO 8601 (UTC)"""
+    return (
+        time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(created))
+        + f'.{int(created % 1 * 1_000_000):06d}'
+    )
+
+
 class JSONFormatter(logging.Formatter):
     """Formatter para logs em JSON"""
     
     def format(self, record: logging.LogRecord) -> str:
         """Formata log record em JSON"""
+        return _dumps(self._log_data(record))
+    
+    def format_bytes(self, record: logging.LogRecord) -> bytes:
+        """Formata log record em JSON já codificado em UTF-8"""
+        return _dumps_bytes(self._log_data(record))
+    
+    def _log_data(self, record: logging.LogRecord) -> Dict[str, Any]:
+        """Monta os campos do registro"""
         log_data = {
-            'timestamp': datetime.utcnow().isoformat(),
+            'timestamp': _timestamp(record.created),
             'level': record.levelname,
             'logger': record.name,
             'message': record.getMessage(),
@@ -24,51 +101,212 @@ class JSONFormatter(logging.Formatter):
             'line': record.lineno,
             'process': record.process,
             'thread': record.thread,
-            'service': os.getenv('SERVICE_NAME', 'jurisprudencia-api'),
-            'environment': os.getenv('ENVIRONMENT', 'development'),
-            'version': os.getenv('APP_VERSION', '1.0.0')
+            **_BASE_FIELDS
         }
         
-        # Adicionar informações de exceção se houver
-        if record.exc_info:
-            log_data['exception'] = self.formatException(record.exc_info)
+        # Adicionar informações de exceção se houver (já em exc_text quando o
+        # record passou pelo LocalQueueHandler)
+        if record.exc_info and not record.exc_text:
+            # Traceback formatado uma vez por record, como no Formatter padrão
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            log_data['exception'] = record.exc_text
         
-        # Adicionar campos extras
-        if hasattr(record, 'extra_fields'):
-            log_data.update(record.extra_fields)
+        # Adicionar campos extras (log_with_context, já com request_id/user_id)
+        attrs = record.__dict__
+        extra_fields = attrs.get('extra_fields')
+        if extra_fields:
+            log_data.update(extra_fields)
         
-        # Adicionar contexto de request se disponível
-        if hasattr(record, 'request_id'):
-            log_data['request_id'] = record.request_id
+        # Contexto de request definido direto no record (ex.: ContextFilter)
+        if 'request_id' in attrs:
+            log_data['request_id'] = attrs['request_id']
+        
+        if 'user_id' in attrs:
+            log_data['user_id'] = attrs['user_id']
+        
+        return log_data
+
+
+# Formata tracebacks no enfileiramento (mesma saída do Formatter padrão)
+_EXC_FORMATTER = logging.Formatter()
+
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler para fila em memória. Como no QueueHandler padrão, a mensagem
+    (msg % args) e o traceback são resolvidos ao enfileirar: argumentos
+    mutáveis alterados depois não mudam o log, e o record na fila não segura
+    a exceção e seus frames. O JSON e a escrita continuam na thread do
+    QueueListener, e os demais atributos (extra_fields...) seguem no record.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Cópia: outros handlers do mesmo logger recebem o record original
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class BytesStreamHandler(logging.StreamHandler):
+    """
+    StreamHandler que, com JSONFormatter e stream UTF-8, grava os bytes do
+    formatter direto no buffer binário do stream (ex.: sys.stderr.buffer), sem
+    o passo str -> bytes do TextIOWrapper
+    """
+    
+    def emit(self, record: logging.LogRecord):
+        buffer = getattr(self.stream, 'buffer', None)
+        if (buffer is None or not isinstance(self.formatter, JSONFormatter)
+                or not _is_utf8(getattr(self.stream, 'encoding', None))):
+            super().emit(record)
+            return
+        
+        try:
+            data = self.formatter.format_bytes(record) + self.terminator.encode('utf-8')
+            self.stream.flush()  # texto pendente no TextIOWrapper sai antes
+            buffer.write(data)
+            buffer.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+class BufferedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler que acumula os registros formatados num buffer e grava
+    em lote: ao atingir buffer_size bytes, após flush_interval segundos da
+    última gravação, ou no flush/close. A rotação é verificada após cada
+    gravação, de modo que o arquivo pode exceder maxBytes em até um lote.
+    """
+    
+    def __init__(self, filename, mode='a', maxBytes=0, backupCount=0,
+                 encoding=None, delay=False, buffer_size: int = 64 * 1024,
+                 flush_interval: float = 0.5):
+        super().__init__(
+            filename, mode=mode, maxBytes=maxBytes, backupCount=backupCount,
+            encoding=encoding, delay=delay
+        )
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer = bytearray()
+        self._last_flush = time.monotonic()
+    
+    def emit(self, record: logging.LogRecord):
+        """Acumula o registro e grava o lote quando necessário"""
+        try:
+            if isinstance(self.formatter, JSONFormatter) and _is_utf8(self.encoding):
+                # JSON em bytes direto para o buffer
+                self._buffer += self.formatter.format_bytes(record)
+                self._buffer += self.terminator.encode('utf-8')
+            else:
+                self._buffer += (self.format(record) + self.terminator).encode(self.encoding or 'utf-8')
+            if (len(self._buffer) >= self.buffer_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._write_buffer()
+        except Exception:
+            self.handleError(record)
+    
+    def _write_buffer(self):
+        """Grava o buffer com uma única escrita e faz a rotação se preciso (chamar com o lock)"""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
         
-        if hasattr(record, 'user_id'):
-            log_data['user_id'] = record.user_id
+        if self.stream is None:
+            self.stream = self._open()
+        self.stream.buffer.write(self._buffer)
+        self.stream.buffer.flush()
+        self._buffer.clear()
         
-        return json.dumps(log_data, ensure_ascii=False)
+        if self.maxBytes > 0 and self.stream.buffer.tell() >= self.maxBytes:
+            self.doRollover()
+    
+    def flush(self):
+        """Grava o que estiver no buffer"""
+        self.acquire()
+        try:
+            self._write_buffer()
+        finally:
+            self.release()
+        super().flush()
+    
+    def close(self):
+        self.flush()
+        super().close()
+
+
+class FlushingQueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener que, com a fila ociosa por flush_interval segundos, faz flush
+    dos handlers: registros acumulados em BufferedRotatingFileHandler não ficam
+    presos no buffer à espera do próximo log
+    """
+    
+    def __init__(self, queue_, *handlers, respect_handler_level=False, flush_interval: float = 0.5):
+        super().__init__(queue_, *handlers, respect_handler_level=respect_handler_level)
+        self.flush_interval = flush_interval
+    
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block, timeout=self.flush_interval)
+            except queue.Empty:
+                if not block:
+                    raise
+                for handler in self.handlers:
+                    handler.flush()
+
+
+# Listener ativo (thread que escreve nos handlers reais)
+_queue_listener = None
+
+
+def _stop_queue_listener():
+    """Para o listener ativo, esvaziando a fila e fechando seus handlers"""
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        for handler in _queue_listener.handlers:
+            handler.close()
+        _queue_listener = None
+
+
+atexit.register(_stop_queue_listener)
 
 
 class ContextFilter(logging.Filter):
     """Filtro para adicionar contexto aos logs"""
     
+    __slots__ = ('context',)
+    
     def __init__(self):
         super().__init__()
         self.context = {}
     
     def filter(self, record: logging.LogRecord) -> bool:
         """Adiciona contexto ao log record"""
-        # Adicionar contexto global
-        for key, value in self.context.items():
-            setattr(record, key, value)
+        # Adicionar contexto global (uma única atualização do __dict__)
+        if self.context:
+            record.__dict__.update(self.context)
         
         return True
     
     def set_context(self, **kwargs):
         """Define contexto global"""
-        self.context.update(kwargs)
+        # Troca o dicionário inteiro: filter() nunca vê uma atualização pela metade
+        self.context = {**self.context, **kwargs}
     
     def clear_context(self):
         """Limpa contexto global"""
-        self.context.clear()
+        self.context = {}
 
 
 def setup_logging(
@@ -76,17 +314,39 @@ def setup_logging(
     log_file: str = None,
     max_file_size: int = 10 * 1024 * 1024,  # 10MB
     backup_count: int = 5,
-    use_json: bool = True
+    use_json: bool = True,
+    rotation: str = 'internal'
 ) -> logging.Logger:
     """
     Configura sistema de logging
     
+    O logger raiz recebe apenas um LocalQueueHandler; os handlers de console e
+    arquivo rodam num QueueListener em background.
+    
+    Com log_file definido, o arquivo (JSON, se use_json) é a fonte de verdade
+    para os agregadores de log: o console passa a usar o formato texto, mais
+    barato, e pode ser desligado com DISABLE_CONSOLE_LOG=1.
+    
+    Com rotation='external' a rotação fica a cargo do sistema (logrotate) e o
+    arquivo é escrito por um WatchedFileHandler, que apenas reabre o arquivo
+    quando ele é movido. Exemplo de /etc/logrotate.d/jurisprudencia:
+    
+        /app/logs/app.log {
+            daily
+            rotate 7
+            compress
+            missingok
+            notifempty
+        }
+    
     Args:
         level: Nível de log (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         log_file: Caminho para arquivo de log
         max_file_size: Tamanho máximo do arquivo de log
         backup_count: Número de arquivos de backup
         use_json: Se deve usar formato JSON
+        rotation: 'internal' (BufferedRotatingFileHandler, usa max_file_size e
+            backup_count) ou 'external' (WatchedFileHandler + logrotate)
     
     Returns:
         Logger configurado
@@ -99,39 +359,53 @@ def setup_logging(
     root_logger = logging.getLogger()
     root_logger.setLevel(numeric_level)
     
-    # Limpar handlers existentes
+    # Limpar handlers existentes (e o listener de uma configuração anterior)
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
+    _stop_queue_listener()
     
     # Configurar formatter
-    if use_json:
-        formatter = JSONFormatter()
-    else:
-        formatter = logging.Formatter(
-            fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
+    text_formatter = logging.Formatter(
+        fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    formatter = JSONFormatter() if use_json else text_formatter
     
-    # Handler para console
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(numeric_level)
-    console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
+    # Handler para console (em texto quando há arquivo, para não formatar JSON duas vezes)
+    handlers = []
+    disable_console = os.getenv('DISABLE_CONSOLE_LOG', '').lower() in ('1', 'true', 'yes')
+    if not (log_file and disable_console):
+        console_handler = BytesStreamHandler()
+        console_handler.setLevel(numeric_level)
+        console_handler.setFormatter(text_formatter if log_file else formatter)
+        handlers.append(console_handler)
     
     # Handler para arquivo se especificado
     if log_file:
         # Criar diretório se não existir
         os.makedirs(os.path.dirname(log_file), exist_ok=True)
         
-        file_handler = logging.handlers.RotatingFileHandler(
-            log_file,
-            maxBytes=max_file_size,
-            backupCount=backup_count,
-            encoding='utf-8'
-        )
+        if rotation == 'external':
+            file_handler = logging.handlers.WatchedFileHandler(log_file, encoding='utf-8')
+        else:
+            file_handler = BufferedRotatingFileHandler(
+                log_file,
+                maxBytes=max_file_size,
+                backupCount=backup_count,
+                encoding='utf-8'
+            )
         file_handler.setLevel(numeric_level)
         file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
+        handlers.append(file_handler)
+    
+    # Escrita assíncrona: quem loga só enfileira o record
+    global _queue_listener
+    log_queue = queue.SimpleQueue()
+    _queue_listener = FlushingQueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    _queue_listener.start()
+    root_logger.addHandler(LocalQueueHandler(log_queue))
     
     # Adicionar filtro de contexto
     context_filter = ContextFilter()
@@ -182,38 +456,50 @@ def get_logger(name: str) -> logging.Logger:
     return logging.getLogger(name)
 
 
-def log_with_context(logger: logging.Logger, level: str, message: str, **context):
+def log_with_context(logger: logging.Logger, level: str, message: str, *args, **context):
     """
     Faz log com contexto adicional
     
     Args:
         logger: Logger instance
         level: Nível do log
-        message: Mensagem
+        message: Mensagem (aceita formatação %, aplicada só se o record for emitido)
+        *args: Argumentos da mensagem
         **context: Contexto adicional
     """
+    numeric_level = _resolve_level(level)
+    if not logger.isEnabledFor(numeric_level):
+        return
     
-    # Criar record com contexto
-    record = logging.LogRecord(
-        name=logger.name,
-        level=getattr(logging, level.upper()),
-        pathname='',
-        lineno=0,
-        msg=message,
-        args=(),
-        exc_info=None
-    )
+    # O contexto vai em extra_fields, consumido pelo JSONFormatter
+    logger.log(numeric_level, message, *args, extra={'extra_fields': context}, stacklevel=2)
+
+
+def log_with_context_int(logger: logging.Logger, level: int, message: str, *args,
+                         stacklevel: int = 2, **context):
+    """
+    Igual a log_with_context, mas recebe o nível já numérico (logging.INFO...)
     
-    # Adicionar contexto
-    record.extra_fields = context
+    Args:
+        logger: Logger instance
+        level: Nível do log (constante do módulo logging)
+        message: Mensagem (aceita formatação %, aplicada só se o record for emitido)
+        *args: Argumentos da mensagem
+        stacklevel: Quadro atribuído ao record (2 = quem chamou esta função;
+            wrappers passam 3 para apontar para quem os chamou)
+        **context: Contexto adicional
+    """
+    if not logger.isEnabledFor(level):
+        return
     
-    # Fazer log
-    logger.handle(record)
+    logger.log(level, message, *args, extra={'extra_fields': context}, stacklevel=stacklevel)
 
 
 class RequestLogger:
     """Logger para requests HTTP"""
     
+    __slots__ = ('logger',)
+    
     def __init__(self, logger_name: str = 'src.api.requests'):
         self.logger = get_logger(logger_name)
     
@@ -228,6 +514,13 @@ class RequestLogger:
         **extra
     ):
         """Log de request HTTP"""
+        level = (
+            logging.ERROR if status_code >= 500
+            else logging.WARNING if status_code >= 400
+            else logging.INFO
+        )
+        if not self.logger.isEnabledFor(level):
+            return
         
         context = {
             'method': method,
@@ -239,23 +532,30 @@ class RequestLogger:
             **extra
         }
         
-        level = 'ERROR' if status_code >= 500 else 'WARNING' if status_code >= 400 else 'INFO'
-        message = f"{method} {path} - {status_code} ({duration:.2f}s)"
-        
-        log_with_context(self.logger, level, message, **context)
+        log_with_context_int(
+            self.logger, level, "%s %s - %s (%.2fs)",
+            method, path, status_code, duration,
+            stacklevel=3,
+            **context
+        )
 
 
 class TaskLogger:
     """Logger para tarefas Celery"""
     
+    __slots__ = ('logger',)
+    
     def __init__(self, logger_name: str = 'src.pipeline.tasks'):
         self.logger = get_logger(logger_name)
     
     def log_task_start(self, task_name: str, task_id: str, **context):
         """Log início de tarefa"""
-        message = f"Task {task_name} started"
-        log_with_context(
-            self.logger, 'INFO', message,
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        
+        log_with_context_int(
+            self.logger, logging.INFO, "Task %s started", task_name,
+            stacklevel=3,
             task_name=task_name,
             task_id=task_id,
             **context
@@ -263,9 +563,12 @@ class TaskLogger:
     
     def log_task_success(self, task_name: str, task_id: str, duration: float, **context):
         """Log sucesso de tarefa"""
-        message = f"Task {task_name} completed successfully ({duration:.2f}s)"
-        log_with_context(
-            self.logger, 'INFO', message,
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        
+        log_with_context_int(
+            self.logger, logging.INFO, "Task %s completed successfully (%.2fs)", task_name, duration,
+            stacklevel=3,
             task_name=task_name,
             task_id=task_id,
             duration=duration,
@@ -274,9 +577,12 @@ class TaskLogger:
     
     def log_task_failure(self, task_name: str, task_id: str, error: str, **context):
         """Log falha de tarefa"""
-        message = f"Task {task_name} failed: {error}"
-        log_with_context(
-            self.logger, 'ERROR', message,
+        if not self.logger.isEnabledFor(logging.ERROR):
+            return
+        
+        log_with_context_int(
+            self.logger, logging.ERROR, "Task %s failed: %s", task_name, error,
+            stacklevel=3,
             task_name=task_name,
             task_id=task_id,
             error=error,
@@ -284,9 +590,23 @@ class TaskLogger:
         )
 
 
-# Instâncias globais
-request_logger = RequestLogger()
-task_logger = TaskLogger()
+# Instâncias globais, criadas no primeiro acesso (PEP 562)
+_LAZY_LOGGERS = {
+    'request_logger': RequestLogger,
+    'task_logger': TaskLogger
+}
+
+
+def __getattr__(name):
+    """Cria request_logger/task_logger no primeiro acesso e guarda no módulo"""
+    try:
+        factory = _LAZY_LOGGERS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    
+    value = globals()[name] = factory()
+    return value
+
 
 # Configuração padrão baseada em variáveis de ambiente
 def setup_default_logging():
@@ -295,9 +615,11 @@ def setup_default_logging():
     level = os.getenv('LOG_LEVEL', 'INFO')
     log_file = os.getenv('LOG_FILE', './logs/app.log')
     use_json = os.getenv('LOG_FORMAT', 'json').lower() == 'json'
+    rotation = os.getenv('LOG_ROTATION', 'internal').lower()
     
     return setup_logging(
         level=level,
         log_file=log_file,
-        use_json=use_json
+        use_json=use_json,
+        rotation=rotation
     )
\ No newline at end of file
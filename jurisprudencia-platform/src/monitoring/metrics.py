@@ -4,6 +4,7 @@ Sistema de métricas usando Prometheus
 
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
 from functools import wraps
+import os
 import time
 import logging
 from typing import Callable, Any
@@ -103,31 +104,50 @@ pdf_size_bytes = Histogram(
 
 # Decoradores para instrumentação automática
 
+def _bound(cache: dict, metric, *labelvalues):
+    """Métrica filha para os labels, vinculada uma única vez e guardada no cache"""
+    child = cache.get(labelvalues)
+    if child is None:
+        child = cache[labelvalues] = metric.labels(*labelvalues)
+    return child
+
+
 def track_http_requests(func: Callable) -> Callable:
     """Decorator para rastrear requests HTTP"""
+    # Métricas filhas por (method, path, status) e (method, path)
+    contadores = {}
+    duracoes = {}
+    
     @wraps(func)
     async def wrapper(*args, **kwargs):
-        start_time = time.time()
+        start = time.perf_counter()
         
-        # Extrair informações do request
-        request = kwargs.get('request') or args[0] if args else None
-        method = getattr(request, 'method', 'UNKNOWN')
-        path = getattr(request.url, 'path', 'unknown') if hasattr(request, 'url') else 'unknown'
+        # Extrair informações do request (FastAPI o passa por nome)
+        request = kwargs.get('request')
+        if request is None and args:
+            request = args[0]
+        try:
+            method = request.method
+        except AttributeError:
+            method = 'UNKNOWN'
+        try:
+            path = request.url.path
+        except AttributeError:
+            path = 'unknown'
         
         try:
             response = await func(*args, **kwargs)
+            duracao = time.perf_counter() - start
             status = getattr(response, 'status_code', 200)
             
             # Registrar métricas
-            http_requests_total.labels(method=method, endpoint=path, status=status).inc()
-            http_request_duration_seconds.labels(method=method, endpoint=path).observe(
-                time.time() - start_time
-            )
+            _bound(contadores, http_requests_total, method, path, status).inc()
+            _bound(duracoes, http_request_duration_seconds, method, path).observe(duracao)
             
             return response
         except Exception as e:
             # Registrar erro
-            http_requests_total.labels(method=method, endpoint=path, status=500).inc()
+            _bound(contadores, http_requests_total, method, path, 500).inc()
             raise
     
     return wrapper
@@ -136,16 +156,18 @@ def track_http_requests(func: Callable) -> Callable:
 def track_database_queries(operation: str, table: str = 'unknown'):
     """Decorator para rastrear queries do banco"""
     def decorator(func: Callable) -> Callable:
+        # Labels fixos: métricas filhas vinculadas uma única vez
+        queries = database_queries_total.labels(operation=operation, table=table)
+        duracao = database_query_duration_seconds.labels(operation=operation, table=table)
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
-            start_time = time.time()
+            start = time.perf_counter()
             
             try:
                 result = func(*args, **kwargs)
-                database_queries_total.labels(operation=operation, table=table).inc()
-                database_query_duration_seconds.labels(operation=operation, table=table).observe(
-                    time.time() - start_time
-                )
+                queries.inc()
+                duracao.observe(time.perf_counter() - start)
                 return result
             except Exception as e:
                 logger.error(f"Database query failed: {e}")
@@ -158,23 +180,25 @@ def track_database_queries(operation: str, table: str = 'unknown'):
 def track_search_requests(search_type: str):
     """Decorator para rastrear requests de busca"""
     def decorator(func: Callable) -> Callable:
+        # Labels fixos: métricas filhas vinculadas uma única vez
+        requests = search_requests_total.labels(search_type=search_type)
+        duracao = search_duration_seconds.labels(search_type=search_type)
+        resultados = search_results_count.labels(search_type=search_type)
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
-            start_time = time.time()
+            start = time.perf_counter()
             
             try:
                 result = func(*args, **kwargs)
                 
                 # Registrar métricas
-                search_requests_total.labels(search_type=search_type).inc()
-                search_duration_seconds.labels(search_type=search_type).observe(
-                    time.time() - start_time
-                )
+                requests.inc()
+                duracao.observe(time.perf_counter() - start)
                 
                 # Contar resultados se possível
                 if hasattr(result, 'get') and 'results' in result:
-                    results_count = len(result['results'])
-                    search_results_count.labels(search_type=search_type).observe(results_count)
+                    resultados.observe(len(result['results']))
                 
                 return result
             except Exception as e:
@@ -188,19 +212,22 @@ def track_search_requests(search_type: str):
 def track_celery_tasks(task_name: str):
     """Decorator para rastrear tarefas Celery"""
     def decorator(func: Callable) -> Callable:
+        # Labels fixos: métricas filhas vinculadas uma única vez
+        sucessos = celery_tasks_total.labels(task_name=task_name, status='success')
+        falhas = celery_tasks_total.labels(task_name=task_name, status='failure')
+        duracao = celery_task_duration_seconds.labels(task_name=task_name)
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
-            start_time = time.time()
+            start = time.perf_counter()
             
             try:
                 result = func(*args, **kwargs)
-                celery_tasks_total.labels(task_name=task_name, status='success').inc()
-                celery_task_duration_seconds.labels(task_name=task_name).observe(
-                    time.time() - start_time
-                )
+                sucessos.inc()
+                duracao.observe(time.perf_counter() - start)
                 return result
             except Exception as e:
-                celery_tasks_total.labels(task_name=task_name, status='failure').inc()
+                falhas.inc()
                 logger.error(f"Celery task {task_name} failed: {e}")
                 raise
         
@@ -208,35 +235,52 @@ def track_celery_tasks(task_name: str):
     return decorator
 
 
+# Status fixos do processamento de PDFs
+_pdf_sucessos = pdf_processed_total.labels(status='success')
+_pdf_falhas = pdf_processed_total.labels(status='failure')
+
+
 def track_pdf_processing(func: Callable) -> Callable:
-    """Decorator para rastrear processamento de PDFs"""
+    """
+    Decorator para rastrear processamento de PDFs
+    
+    O tamanho registrado vem do argumento ``pdf_size=`` da chamada, quando
+    informado (e repassado normalmente à função); sem ele, o arquivo em
+    ``pdf_path`` é consultado com stat.
+    """
     @wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.time()
+        start = time.perf_counter()
         
         try:
             result = func(*args, **kwargs)
-            pdf_processed_total.labels(status='success').inc()
-            pdf_processing_duration_seconds.observe(time.time() - start_time)
+            _pdf_sucessos.inc()
+            pdf_processing_duration_seconds.observe(time.perf_counter() - start)
             
             # Registrar tamanho do PDF se disponível
-            if 'pdf_path' in kwargs:
+            pdf_size = kwargs.get('pdf_size')
+            if pdf_size is None and 'pdf_path' in kwargs:
                 try:
-                    import os
-                    size = os.path.getsize(kwargs['pdf_path'])
-                    pdf_size_bytes.observe(size)
-                except:
+                    pdf_size = os.path.getsize(kwargs['pdf_path'])
+                except OSError:
                     pass
+            if pdf_size is not None:
+                pdf_size_bytes.observe(pdf_size)
             
             return result
         except Exception as e:
-            pdf_processed_total.labels(status='failure').inc()
+            _pdf_falhas.inc()
             logger.error(f"PDF processing failed: {e}")
             raise
     
     return wrapper
 
 
+# Última exposição gerada: scrapes dentro do TTL reaproveitam o mesmo corpo
+_METRICS_TTL = 1.0
+_metrics_cache = {'t': float('-inf'), 'body': b''}
+
+
 class MetricsCollector:
     """Coletor centralizado de métricas"""
     
@@ -256,9 +300,13 @@ class MetricsCollector:
         celery_queue_length.labels(queue_name=queue_name).set(length)
     
     @staticmethod
-    def get_metrics() -> str:
-        """Retorna métricas no formato Prometheus"""
-        return generate_latest()
+    def get_metrics() -> bytes:
+        """Retorna métricas no formato Prometheus (geradas no máximo uma vez por segundo)"""
+        now = time.monotonic()
+        if now - _metrics_cache['t'] > _METRICS_TTL:
+            _metrics_cache['body'] = generate_latest()
+            _metrics_cache['t'] = now
+        return _metrics_cache['body']
     
     @staticmethod
     def get_content_type() -> str:
@@ -13,7 +13,8 @@ from .notification_service import (
     TelegramProvider,
     SMSProvider,
     DiscordProvider,
-    notification_worker
+    notification_worker,
+    run_notification_worker
 )
 
 from .alert_rules import (
@@ -21,7 +22,9 @@ from .alert_rules import (
     AlertRule,
     AlertCondition,
     AlertCategory,
-    alert_processor
+    alert_processor,
+    create_alert_queue,
+    start_alert_processors
 )
 
 __all__ = [
@@ -37,11 +40,14 @@ __all__ = [
     'SMSProvider',
     'DiscordProvider',
     'notification_worker',
+    'run_notification_worker',
     
     # Alert Rules
     'AlertEngine',
     'AlertRule',
     'AlertCondition',
     'AlertCategory',
-    'alert_processor'
+    'alert_processor',
+    'create_alert_queue',
+    'start_alert_processors'
 ]
\ No newline at end of file
@@ -6,22 +6,38 @@ Define regras automáticas para gerar alertas baseados em eventos
 
 import os
 import json
-from typing import Dict, List, Optional, Any, Callable
+import operator
+import random
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Optional, Any, Callable, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
 from enum import Enum
 import asyncio
 import logging
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, JSON, Boolean
+from sqlalchemy import (
+    create_engine, Column, Integer, String, Float, DateTime, JSON, Boolean, Index,
+    event, select, update, case
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import re
 
 from .notification_service import (
     NotificationService, NotificationEvent, 
-    NotificationType, NotificationPriority, NotificationChannel
+    NotificationType, NotificationPriority, NotificationChannel,
+    _sqlite_pragmas
 )
 
+# orjson (opcional) decodifica eventos serializados bem mais rápido que o json da stdlib
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -29,6 +45,77 @@ logger = logging.getLogger(__name__)
 # Base SQLAlchemy
 Base = declarative_base()
 
+# Padrões REGEX compilados, compartilhados entre todas as regras
+_REGEX_CACHE: Dict[str, "re.Pattern"] = {}
+
+
+def _compilar_regex(padrao: str) -> "re.Pattern":
+    """Obter padrão compilado do cache (compila apenas na primeira vez)"""
+    compilado = _REGEX_CACHE.get(padrao)
+    if compilado is None:
+        compilado = _REGEX_CACHE[padrao] = re.compile(padrao)
+    return compilado
+
+
+def _walk(data: Any, path: Tuple[str, ...]) -> Any:
+    """Percorrer dicts aninhados seguindo um caminho já separado"""
+    for part in path:
+        if isinstance(data, dict) and part in data:
+            data = data[part]
+        else:
+            return None
+    return data
+
+
+class SlidingWindow:
+    """Janela deslizante de (instante monotônico, valor) com soma incremental"""
+    
+    __slots__ = ('window_s', 'entries', 'total')
+    
+    def __init__(self, window_s: float):
+        self.window_s = window_s
+        self.entries: deque = deque()
+        self.total = 0.0
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def add(self, ts: float, value: float):
+        self.entries.append((ts, value))
+        self.total += value
+    
+    def evict(self, now: float):
+        """Descartar entradas mais antigas que a janela"""
+        cutoff = now - self.window_s
+        entries = self.entries
+        while entries and entries[0][0] < cutoff:
+            self.total -= entries.popleft()[1]
+        if not entries:
+            self.total = 0.0
+
+
+def _window_threshold(window: SlidingWindow, count: bool, threshold: float) -> bool:
+    """Threshold sobre a janela: quantidade de entradas (count) ou média"""
+    if count:
+        return len(window) > threshold
+    return bool(window) and window.total / len(window) > threshold
+
+
+def _window_rate(window: SlidingWindow, error_rate: bool, max_rate: float) -> bool:
+    """Taxa sobre a janela: fração de falhas (error_rate) ou variação primeiro/último"""
+    if error_rate:
+        # total acumula 1 por alerta com falha
+        return bool(window) and window.total / len(window) > max_rate
+    
+    if len(window) >= 2:
+        first_value = window.entries[0][1]
+        last_value = window.entries[-1][1]
+        
+        if first_value > 0:
+            return abs((last_value - first_value) / first_value) > max_rate
+    
+    return False
+
 
 class AlertCondition(Enum):
     """Condições de alerta"""
@@ -45,6 +132,97 @@ class AlertCondition(Enum):
     RATE_EXCEEDED = "rate_exceeded"
 
 
+# Códigos inteiros das condições simples, resolvidos na compilação da regra
+# (chaves de _EXPRESSOES em _gerar_predicado)
+(_K_EQUALS, _K_NOT_EQUALS, _K_GREATER_THAN, _K_LESS_THAN, _K_CONTAINS,
+ _K_NOT_CONTAINS, _K_REGEX, _K_IN, _K_NOT_IN) = range(9)
+
+_CONDITION_KIND = {
+    AlertCondition.EQUALS: _K_EQUALS,
+    AlertCondition.NOT_EQUALS: _K_NOT_EQUALS,
+    AlertCondition.GREATER_THAN: _K_GREATER_THAN,
+    AlertCondition.LESS_THAN: _K_LESS_THAN,
+    AlertCondition.CONTAINS: _K_CONTAINS,
+    AlertCondition.NOT_CONTAINS: _K_NOT_CONTAINS,
+    AlertCondition.REGEX: _K_REGEX,
+    AlertCondition.IN: _K_IN,
+    AlertCondition.NOT_IN: _K_NOT_IN
+}
+
+
+# Expressão de cada condição simples no código gerado por _gerar_predicado:
+# v é o valor do campo e c{i} a constante da condição (já convertida/compilada)
+_EXPRESSOES = {
+    _K_EQUALS: 'v == c{i}',
+    _K_NOT_EQUALS: 'v != c{i}',
+    _K_GREATER_THAN: 'float(v) > c{i}',
+    _K_LESS_THAN: 'float(v) < c{i}',
+    _K_CONTAINS: 'c{i} in str(v)',
+    _K_NOT_CONTAINS: 'c{i} not in str(v)',
+    _K_REGEX: 'c{i}.match(str(v))',
+    _K_IN: 'v in c{i}',
+    _K_NOT_IN: 'v not in c{i}'
+}
+
+
+def _gerar_predicado(rule_id: str, simples: List[Tuple[int, Tuple[str, ...], Any]],
+                     por_valores: bool = False) -> Callable:
+    """Gerar uma única função com as condições simples em linha reta
+    
+    Valores e caminhos vêm da regra (banco) e entram apenas como nomes do
+    namespace (p{i}/c{i}); o código-fonte contém só os modelos de _EXPRESSOES.
+    Com por_valores, a função recebe a chave de _memoizar_predicado (pares
+    (tipo, valor) já extraídos do evento) em vez do evento.
+    """
+    namespace = {'_walk': _walk, 'logger': logger}
+    linhas = ['def predicado(d):', '    try:']
+    
+    for i, (kind, path, valor) in enumerate(simples):
+        namespace[f'p{i}'] = path[0] if len(path) == 1 else path
+        namespace[f'c{i}'] = valor
+        if por_valores:
+            linhas.append(f'        v = d[{i}][1]')
+        elif len(path) == 1:
+            linhas.append(f'        v = d.get(p{i})')
+        else:
+            linhas.append(f'        v = _walk(d, p{i})')
+        linhas.append(f'        if not ({_EXPRESSOES[kind].format(i=i)}):')
+        linhas.append('            return False')
+    
+    linhas += [
+        '        return True',
+        '    except Exception as e:',
+        '        logger.error(f"Erro ao avaliar condição: {e}")',
+        '        return False'
+    ]
+    
+    exec(compile('\n'.join(linhas), f'<alert_rule:{rule_id}>', 'exec'), namespace)
+    return namespace['predicado']
+
+
+def _memoizar_predicado(rule_id: str, simples: List[Tuple[int, Tuple[str, ...], Any]],
+                        maxsize: int = 4096) -> Callable:
+    """Predicado com cache LRU pelos valores dos campos referenciados
+    
+    A chave leva o tipo de cada valor (1, 1.0 e True têm o mesmo hash, mas
+    str() diferente). O cache pertence à regra compilada: recompilar a regra
+    descarta os resultados antigos.
+    """
+    avaliar = lru_cache(maxsize=maxsize)(_gerar_predicado(rule_id, simples, por_valores=True))
+    sem_cache = avaliar.__wrapped__
+    paths = tuple(path for _, path, _ in simples)
+    
+    def predicado(d):
+        chave = tuple([(v.__class__, v) for v in [_walk(d, path) for path in paths]])
+        try:
+            return avaliar(chave)
+        except TypeError:
+            # Valor não hashable (lista, dict): avaliar sem cache
+            return sem_cache(chave)
+    
+    return predicado
+
+
 class AlertCategory(Enum):
     """Categorias de alertas"""
     SECURITY = "security"
@@ -70,6 +248,15 @@ class AlertRule:
     cooldown_minutes: int = 60
     last_triggered: Optional[datetime] = None
     metadata: Dict[str, Any] = field(default_factory=dict)
+    # Predicados (event_data) -> bool gerados por AlertEngine._compilar_regra
+    compiled_predicates: List[Callable] = field(default_factory=list, repr=False, compare=False)
+    # cooldown_minutes em segundos, pré-calculado na compilação
+    cooldown_s: float = field(default=0.0, repr=False, compare=False)
+    # Tipo da notificação e canais convertidos por índice da ação 'notification'
+    notification_type: Optional[NotificationType] = field(default=None, repr=False, compare=False)
+    action_channels: Dict[int, List[NotificationChannel]] = field(
+        default_factory=dict, repr=False, compare=False
+    )
 
 
 class AlertRuleDB(Base):
@@ -103,6 +290,12 @@ class AlertHistory(Base):
     actions_taken = Column(JSON)
     success = Column(Boolean, default=True)
     error_message = Column(String(500), nullable=True)
+    
+    __table_args__ = (
+        # Janelas de contagem/taxa de erro e estatísticas por período
+        Index('ix_hist_ts_success', 'triggered_at', 'success'),
+        Index('ix_hist_rule_ts', 'rule_id', 'triggered_at'),
+    )
 
 
 class AlertMetrics(Base):
@@ -114,26 +307,64 @@ class AlertMetrics(Base):
     metric_value = Column(Float)
     timestamp = Column(DateTime, default=datetime.utcnow)
     tags = Column(JSON)
+    
+    __table_args__ = (
+        # metric_name == X AND timestamp >= since vira uma única busca por faixa
+        Index('ix_metrics_name_ts', 'metric_name', 'timestamp'),
+    )
 
 
 class AlertEngine:
     """Motor de processamento de alertas"""
     
+    # Avaliadores das condições simples: (valor atual, valor esperado) -> bool
+    _EVALUATORS: Dict[AlertCondition, Callable[[Any, Any], bool]] = {
+        AlertCondition.EQUALS: operator.eq,
+        AlertCondition.NOT_EQUALS: operator.ne,
+        AlertCondition.GREATER_THAN: lambda a, e: float(a) > float(e),
+        AlertCondition.LESS_THAN: lambda a, e: float(a) < float(e),
+        AlertCondition.CONTAINS: lambda a, e: e in str(a),
+        AlertCondition.NOT_CONTAINS: lambda a, e: e not in str(a),
+        AlertCondition.REGEX: lambda a, e: bool(_compilar_regex(e).match(str(a))),
+        AlertCondition.IN: lambda a, e: a in e,
+        AlertCondition.NOT_IN: lambda a, e: a not in e
+    }
+    
     def __init__(self, db_url: Optional[str] = None):
         # Configurar banco
         if not db_url:
             db_url = os.getenv('DATABASE_URL', 'sqlite:///alerts.db')
         
         self.engine = create_engine(db_url)
+        if db_url.startswith('sqlite'):
+            event.listen(self.engine, 'connect', _sqlite_pragmas)
         Base.metadata.create_all(self.engine)
         self.SessionLocal = sessionmaker(bind=self.engine)
         
         # Serviço de notificações
         self.notification_service = NotificationService(db_url)
         
-        # Cache de regras
+        # Último disparo por regra (time.monotonic) e escritas pendentes
+        # (last_triggered, histórico, métricas), gravadas em lote por _flush_loop
+        self._last_triggered: Dict[str, float] = {}
+        self._pending_trigger_updates: deque = deque()
+        self._history_buffer: List[AlertHistory] = []
+        self._metric_buffer: List[AlertMetrics] = []
+        self.flush_interval_s = 1.0
+        self.flush_batch_size = 500
+        
+        # Janelas em memória para threshold/rate: métricas por nome -> segundos
+        # e histórico de alertas (valor 1 = falha) por segundos
+        self._metric_windows: Dict[str, Dict[int, SlidingWindow]] = {}
+        self._history_windows: Dict[int, SlidingWindow] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        
+        # Cache de regras e índice por event_type (regras sem discriminador
+        # ficam em _rules_unindexed e são avaliadas para todo evento; cada
+        # entrada do índice já as inclui)
         self.rules_cache: Dict[str, AlertRule] = {}
-        self._load_rules()
+        self._rules_by_event_type: Dict[Any, Tuple[AlertRule, ...]] = {}
+        self._rules_unindexed: Tuple[AlertRule, ...] = ()
         
         # Condições customizadas
         self.custom_conditions: Dict[str, Callable] = {}
@@ -145,32 +376,253 @@ class AlertEngine:
         self._initialize_default_rules()
     
     def _load_rules(self):
-        """Carregar regras do banco"""
+        """Carregar todas as regras ativas do banco"""
         try:
             with self.SessionLocal() as session:
-                db_rules = session.query(AlertRuleDB).filter(
-                    AlertRuleDB.enabled == True
-                ).all()
+                db_rules = session.execute(
+                    select(AlertRuleDB)
+                    .where(AlertRuleDB.enabled == True)
+                    .execution_options(yield_per=500)
+                ).scalars()
+                
+                rules_cache = {}
+                now = datetime.utcnow()
+                now_mono = time.monotonic()
                 
-                self.rules_cache.clear()
                 for db_rule in db_rules:
-                    rule = AlertRule(
-                        id=db_rule.id,
-                        name=db_rule.name,
-                        description=db_rule.description,
-                        category=AlertCategory(db_rule.category),
-                        enabled=db_rule.enabled,
-                        conditions=db_rule.conditions or [],
-                        actions=db_rule.actions or [],
-                        priority=NotificationPriority(db_rule.priority),
-                        cooldown_minutes=db_rule.cooldown_minutes,
-                        last_triggered=db_rule.last_triggered,
-                        metadata=db_rule.metadata or {}
-                    )
-                    self.rules_cache[rule.id] = rule
+                    rule = self._rule_from_db(db_rule, now, now_mono)
+                    rules_cache[rule.id] = rule
+                
+                self.rules_cache = rules_cache
                     
         except Exception as e:
             logger.error(f"Erro ao carregar regras: {e}")
+        
+        self._index_rules()
+    
+    def _refresh_rule(self, rule_id: str):
+        """Recarregar uma única regra do banco (removendo-a se desativada)"""
+        try:
+            with self.SessionLocal() as session:
+                db_rule = session.get(AlertRuleDB, rule_id)
+                
+                if db_rule is not None and db_rule.enabled:
+                    rule = self._rule_from_db(db_rule, datetime.utcnow(), time.monotonic())
+                    self.rules_cache[rule.id] = rule
+                else:
+                    self.rules_cache.pop(rule_id, None)
+                    
+        except Exception as e:
+            logger.error(f"Erro ao recarregar regra {rule_id}: {e}")
+        
+        self._index_rules()
+    
+    def _rule_from_db(self, db_rule: AlertRuleDB, now: datetime, 
+                      now_mono: float) -> AlertRule:
+        """Construir e compilar AlertRule a partir da linha do banco"""
+        rule = AlertRule(
+            id=db_rule.id,
+            name=db_rule.name,
+            description=db_rule.description,
+            category=AlertCategory(db_rule.category),
+            enabled=db_rule.enabled,
+            conditions=db_rule.conditions or [],
+            actions=db_rule.actions or [],
+            priority=NotificationPriority(db_rule.priority),
+            cooldown_minutes=db_rule.cooldown_minutes,
+            last_triggered=db_rule.last_triggered,
+            metadata=db_rule.metadata or {}
+        )
+        self._compilar_regra(rule)
+        
+        # Converter último disparo persistido para o relógio monotônico
+        if rule.last_triggered and rule.id not in self._last_triggered:
+            decorrido = (now - rule.last_triggered).total_seconds()
+            self._last_triggered[rule.id] = now_mono - decorrido
+        
+        return rule
+    
+    def _index_rules(self):
+        """Indexar regras pelos valores de event_type exigidos em EQUALS/IN"""
+        by_event_type: Dict[Any, List[AlertRule]] = {}
+        unindexed: List[AlertRule] = []
+        
+        for rule in self.rules_cache.values():
+            event_types = None
+            for condition in rule.conditions:
+                if condition.get('field') != 'event_type':
+                    continue
+                if condition.get('condition') == AlertCondition.EQUALS.value:
+                    event_types = [condition.get('value')]
+                elif (condition.get('condition') == AlertCondition.IN.value
+                      and isinstance(condition.get('value'), (list, tuple, set, frozenset))):
+                    event_types = condition.get('value')
+                if event_types is not None:
+                    break
+            
+            try:
+                for event_type in set(event_types):
+                    by_event_type.setdefault(event_type, []).append(rule)
+            except TypeError:
+                # Sem discriminador (ou valor não hashable)
+                unindexed.append(rule)
+        
+        # Candidatos de cada event_type montados aqui, não a cada evento
+        unindexed = tuple(unindexed)
+        self._rules_by_event_type = {
+            event_type: tuple(rules) + unindexed
+            for event_type, rules in by_event_type.items()
+        }
+        self._rules_unindexed = unindexed
+    
+    def _candidate_rules(self, event_data: Dict[str, Any]) -> Tuple[AlertRule, ...]:
+        """Regras que podem casar com o evento"""
+        try:
+            return self._rules_by_event_type.get(
+                event_data.get('event_type'), self._rules_unindexed
+            )
+        except TypeError:
+            return self._rules_unindexed
+    
+    def _compilar_regra(self, rule: AlertRule):
+        """Compilar condições da regra em predicados, uma única vez no carregamento
+        
+        As condições simples viram uma única função gerada, avaliada primeiro;
+        threshold/rate ficam depois, de modo que uma condição simples falsa
+        evita qualquer consulta a janelas.
+        """
+        simples = []
+        outros = []
+        
+        for condition in rule.conditions:
+            spec = self._condicao_simples(condition)
+            if spec is not None:
+                simples.append(spec)
+            else:
+                outros.append(self._compilar_condicao(rule.id, condition))
+        
+        if simples:
+            # Só REGEX custa mais que montar a chave do cache
+            if any(kind == _K_REGEX for kind, _, _ in simples):
+                outros.insert(0, _memoizar_predicado(rule.id, simples))
+            else:
+                outros.insert(0, _gerar_predicado(rule.id, simples))
+        
+        rule.compiled_predicates = outros
+        rule.cooldown_s = rule.cooldown_minutes * 60
+        
+        # Ações: converter tipo e canais de notificação uma única vez
+        rule.notification_type = self._notification_type(rule)
+        rule.action_channels = {}
+        for index, action in enumerate(rule.actions):
+            if action.get('type') == 'notification' and action.get('channels'):
+                try:
+                    rule.action_channels[index] = self._notification_channels(action)
+                except ValueError:
+                    # Convertido (e o erro registrado) ao executar a ação
+                    pass
+    
+    def _condicao_simples(self, condition: Dict[str, Any]) -> Optional[Tuple[int, Tuple[str, ...], Any]]:
+        """(código, caminho, valor preparado) para condição simples válida, senão None"""
+        try:
+            kind = _CONDITION_KIND.get(AlertCondition(condition.get('condition')))
+            if kind is None:
+                return None
+            
+            path = tuple(condition.get('field').split('.'))
+            valor = condition.get('value')
+            
+            if kind == _K_GREATER_THAN or kind == _K_LESS_THAN:
+                valor = float(valor)
+            elif kind == _K_REGEX:
+                valor = _compilar_regex(valor)
+            
+            return kind, path, valor
+            
+        except (ValueError, TypeError, AttributeError, re.error):
+            # Tratada (e registrada) por _compilar_condicao
+            return None
+    
+    def _compilar_condicao(self, rule_id: str, condition: Dict[str, Any]) -> Callable:
+        """Gerar predicado (event_data) -> bool para uma condição"""
+        field = condition.get('field')
+        expected_value = condition.get('value')
+        
+        try:
+            cond_type = AlertCondition(condition.get('condition'))
+            path = tuple(field.split('.'))
+            if cond_type == AlertCondition.REGEX:
+                _compilar_regex(expected_value)
+        except (ValueError, TypeError, AttributeError, re.error) as e:
+            logger.error(f"Condição inválida na regra {rule_id}: {e}")
+            return lambda event_data: False
+        
+        # Threshold/rate leem a janela em memória, ligada ao predicado aqui
+        if cond_type == AlertCondition.THRESHOLD_EXCEEDED:
+            count = field == "count"
+            window = self._register_window(field, condition.get('window_minutes', 5), count)
+            
+            def predicado(event_data):
+                window.evict(time.monotonic())
+                return _window_threshold(window, count, expected_value)
+        
+        elif cond_type == AlertCondition.RATE_EXCEEDED:
+            error_rate = field == "error_rate"
+            window = self._register_window(field, condition.get('window_minutes', 5), error_rate)
+            
+            def predicado(event_data):
+                window.evict(time.monotonic())
+                return _window_rate(window, error_rate, expected_value)
+        
+        else:
+            evaluate = self._evaluate_condition
+            
+            def predicado(event_data):
+                return evaluate(_walk(event_data, path), cond_type, expected_value)
+        
+        return predicado
+    
+    def _register_window(self, field: str, window_minutes: int, 
+                         history: bool) -> SlidingWindow:
+        """Obter (ou criar, carregando o período do banco) a janela da condição"""
+        window_s = int(window_minutes * 60)
+        if history:
+            windows = self._history_windows
+        else:
+            windows = self._metric_windows.setdefault(field, {})
+        if window_s in windows:
+            return windows[window_s]
+        
+        window = windows[window_s] = SlidingWindow(window_s)
+        
+        try:
+            now = datetime.utcnow()
+            now_mono = time.monotonic()
+            since = now - timedelta(seconds=window_s)
+            
+            with self.SessionLocal() as session:
+                if history:
+                    rows = session.query(
+                        AlertHistory.triggered_at, AlertHistory.success
+                    ).filter(
+                        AlertHistory.triggered_at >= since
+                    ).order_by(AlertHistory.triggered_at).all()
+                    rows = [(ts, 1 if success is False else 0) for ts, success in rows]
+                else:
+                    rows = session.query(
+                        AlertMetrics.timestamp, AlertMetrics.metric_value
+                    ).filter(
+                        AlertMetrics.metric_name == field,
+                        AlertMetrics.timestamp >= since
+                    ).order_by(AlertMetrics.timestamp).all()
+                
+                for ts, value in rows:
+                    window.add(now_mono - (now - ts).total_seconds(), value)
+                    
+        except Exception as e:
+            logger.error(f"Erro ao carregar janela de {field}: {e}")
+        
+        return window
     
     def _initialize_default_rules(self):
         """Inicializar regras padrão"""
@@ -366,60 +818,71 @@ class AlertEngine:
     
     async def process_event(self, event_data: Dict[str, Any]) -> List[str]:
         """Processar evento e verificar regras"""
-        triggered_rules = []
+        self._ensure_flush_task()
+        return await self._process_event(event_data, time.monotonic())
+    
+    async def process_events_batch(self, events: List[Dict[str, Any]]) -> List[List[str]]:
+        """Processar lote de eventos em ordem, com um único instante de cooldown
         
-        for rule_id, rule in self.rules_cache.items():
-            if not rule.enabled:
-                continue
-            
-            # Verificar cooldown
-            if rule.last_triggered:
-                cooldown_end = rule.last_triggered + timedelta(minutes=rule.cooldown_minutes)
-                if datetime.utcnow() < cooldown_end:
-                    continue
+        Retorna as regras disparadas por evento, na ordem do lote.
+        """
+        self._ensure_flush_task()
+        now_mono = time.monotonic()
+        return [await self._process_event(event_data, now_mono) for event_data in events]
+    
+    async def _process_event(self, event_data: Dict[str, Any], now_mono: float) -> List[str]:
+        """Verificar regras para um evento (cooldown avaliado em now_mono)"""
+        candidates = [
+            rule for rule in self._candidate_rules(event_data)
+            if rule.enabled and self._cooldown_ok(rule, now_mono)
+        ]
+        
+        # Predicados são síncronos (janelas em memória): avaliados direto, sem corrotina
+        fired = [rule for rule in candidates if self._check_conditions(rule, event_data)]
+        
+        # Reservar o cooldown antes das ações: outro worker processando a mesma
+        # fila não dispara a regra de novo enquanto as ações rodam
+        fired = [rule for rule in fired if self._claim_cooldown(rule, now_mono)]
+        
+        # Executar ações das regras disparadas
+        await asyncio.gather(*(self._execute_actions(rule, event_data) for rule in fired))
+        
+        if fired:
+            # Um único instante para todos os disparos deste evento
+            now = datetime.utcnow()
+            now_mono = time.monotonic()
             
-            # Verificar condições
-            if await self._check_conditions(rule, event_data):
-                # Executar ações
-                await self._execute_actions(rule, event_data)
-                
+            for rule in fired:
                 # Atualizar última vez disparada
-                self._update_last_triggered(rule.id)
+                self._update_last_triggered(rule.id, now, now_mono)
                 
                 # Registrar no histórico
-                self._log_alert_history(rule, event_data)
-                
-                triggered_rules.append(rule.id)
+                self._log_alert_history(rule, event_data, now, now_mono)
         
-        return triggered_rules
+        return [rule.id for rule in fired]
+    
+    def _cooldown_ok(self, rule: AlertRule, now_mono: float) -> bool:
+        """Verificar se a regra já saiu do cooldown"""
+        last = self._last_triggered.get(rule.id)
+        # cooldown_s <= 0: sem cooldown, mesmo com now_mono anterior ao disparo (lotes)
+        return last is None or rule.cooldown_s <= 0 or now_mono - last >= rule.cooldown_s
+    
+    def _claim_cooldown(self, rule: AlertRule, now_mono: float) -> bool:
+        """Marcar o disparo da regra se ela ainda estiver fora do cooldown"""
+        if not self._cooldown_ok(rule, now_mono):
+            return False
+        self._last_triggered[rule.id] = time.monotonic()
+        return True
     
-    async def _check_conditions(self, rule: AlertRule, event_data: Dict[str, Any]) -> bool:
+    def _check_conditions(self, rule: AlertRule, event_data: Dict[str, Any]) -> bool:
         """Verificar se todas as condições são atendidas"""
         try:
-            for condition in rule.conditions:
-                field = condition.get('field')
-                cond_type = AlertCondition(condition.get('condition'))
-                expected_value = condition.get('value')
-                
-                # Obter valor do campo
-                actual_value = self._get_field_value(event_data, field)
-                
-                # Verificar condição especial de threshold
-                if cond_type == AlertCondition.THRESHOLD_EXCEEDED:
-                    window = condition.get('window_minutes', 5)
-                    if not await self._check_threshold(field, expected_value, window):
-                        return False
-                
-                # Verificar condição especial de rate
-                elif cond_type == AlertCondition.RATE_EXCEEDED:
-                    window = condition.get('window_minutes', 5)
-                    if not await self._check_rate(field, expected_value, window):
-                        return False
-                
-                # Verificar condições normais
-                else:
-                    if not self._evaluate_condition(actual_value, cond_type, expected_value):
-                        return False
+            if rule.conditions and not rule.compiled_predicates:
+                self._compilar_regra(rule)
+            
+            for predicado in rule.compiled_predicates:
+                if not predicado(event_data):
+                    return False
             
             return True
             
@@ -427,142 +890,30 @@ class AlertEngine:
             logger.error(f"Erro ao verificar condições: {e}")
             return False
     
-    def _get_field_value(self, data: Dict[str, Any], field: str) -> Any:
-        """Obter valor de campo (suporta notação de ponto)"""
-        parts = field.split('.')
-        value = data
-        
-        for part in parts:
-            if isinstance(value, dict) and part in value:
-                value = value[part]
-            else:
-                return None
-        
-        return value
-    
     def _evaluate_condition(self, actual_value: Any, condition: AlertCondition, 
                           expected_value: Any) -> bool:
         """Avaliar condição"""
-        try:
-            if condition == AlertCondition.EQUALS:
-                return actual_value == expected_value
-            
-            elif condition == AlertCondition.NOT_EQUALS:
-                return actual_value != expected_value
-            
-            elif condition == AlertCondition.GREATER_THAN:
-                return float(actual_value) > float(expected_value)
-            
-            elif condition == AlertCondition.LESS_THAN:
-                return float(actual_value) < float(expected_value)
-            
-            elif condition == AlertCondition.CONTAINS:
-                return expected_value in str(actual_value)
-            
-            elif condition == AlertCondition.NOT_CONTAINS:
-                return expected_value not in str(actual_value)
-            
-            elif condition == AlertCondition.REGEX:
-                return bool(re.match(expected_value, str(actual_value)))
-            
-            elif condition == AlertCondition.IN:
-                return actual_value in expected_value
-            
-            elif condition == AlertCondition.NOT_IN:
-                return actual_value not in expected_value
-            
-            else:
-                return False
-                
-        except Exception as e:
-            logger.error(f"Erro ao avaliar condição: {e}")
-            return False
-    
-    async def _check_threshold(self, field: str, threshold: float, 
-                             window_minutes: int) -> bool:
-        """Verificar se threshold foi excedido"""
-        try:
-            since = datetime.utcnow() - timedelta(minutes=window_minutes)
-            
-            with self.SessionLocal() as session:
-                # Contar eventos no período
-                if field == "count":
-                    # Contar eventos genéricos
-                    count = session.query(AlertHistory).filter(
-                        AlertHistory.triggered_at >= since
-                    ).count()
-                    return count > threshold
-                else:
-                    # Verificar métricas
-                    metrics = session.query(AlertMetrics).filter(
-                        AlertMetrics.metric_name == field,
-                        AlertMetrics.timestamp >= since
-                    ).all()
-                    
-                    if metrics:
-                        avg_value = sum(m.metric_value for m in metrics) / len(metrics)
-                        return avg_value > threshold
-                    
-                    return False
-                    
-        except Exception as e:
-            logger.error(f"Erro ao verificar threshold: {e}")
+        evaluator = self._EVALUATORS.get(condition)
+        if evaluator is None:
             return False
-    
-    async def _check_rate(self, field: str, max_rate: float, 
-                        window_minutes: int) -> bool:
-        """Verificar se taxa foi excedida"""
+        
         try:
-            since = datetime.utcnow() - timedelta(minutes=window_minutes)
+            return evaluator(actual_value, expected_value)
             
-            with self.SessionLocal() as session:
-                # Calcular taxa
-                if field == "error_rate":
-                    # Contar erros vs total
-                    total = session.query(AlertHistory).filter(
-                        AlertHistory.triggered_at >= since
-                    ).count()
-                    
-                    errors = session.query(AlertHistory).filter(
-                        AlertHistory.triggered_at >= since,
-                        AlertHistory.success == False
-                    ).count()
-                    
-                    if total > 0:
-                        rate = errors / total
-                        return rate > max_rate
-                    
-                    return False
-                else:
-                    # Taxa genérica baseada em métricas
-                    metrics = session.query(AlertMetrics).filter(
-                        AlertMetrics.metric_name == field,
-                        AlertMetrics.timestamp >= since
-                    ).all()
-                    
-                    if len(metrics) >= 2:
-                        # Calcular taxa de mudança
-                        first_value = metrics[0].metric_value
-                        last_value = metrics[-1].metric_value
-                        
-                        if first_value > 0:
-                            rate = (last_value - first_value) / first_value
-                            return abs(rate) > max_rate
-                    
-                    return False
-                    
         except Exception as e:
-            logger.error(f"Erro ao verificar taxa: {e}")
+            logger.error(f"Erro ao avaliar condição: {e}")
             return False
     
     async def _execute_actions(self, rule: AlertRule, event_data: Dict[str, Any]):
         """Executar ações da regra"""
-        for action in rule.actions:
+        for index, action in enumerate(rule.actions):
             action_type = action.get('type')
             
             try:
                 if action_type == 'notification':
-                    await self._action_notification(rule, action, event_data)
+                    await self._action_notification(
+                        rule, action, event_data, rule.action_channels.get(index)
+                    )
                 
                 elif action_type == 'block_ip':
                     await self._action_block_ip(action, event_data)
@@ -586,20 +937,35 @@ class AlertEngine:
             except Exception as e:
                 logger.error(f"Erro ao executar ação {action_type}: {e}")
     
-    async def _action_notification(self, rule: AlertRule, action: Dict, 
-                                 event_data: Dict[str, Any]):
-        """Ação: enviar notificação"""
-        # Determinar canais
+    @staticmethod
+    def _notification_type(rule: AlertRule) -> NotificationType:
+        """Tipo da notificação conforme a categoria da regra"""
+        if rule.category == AlertCategory.SECURITY:
+            return NotificationType.WARNING
+        return NotificationType.INFO
+    
+    @staticmethod
+    def _notification_channels(action: Dict) -> Optional[List[NotificationChannel]]:
+        """Converter canais da ação (None = canais padrão do serviço)"""
         channels = action.get('channels', [])
         if channels:
-            channels = [NotificationChannel(c) for c in channels]
-        else:
-            channels = None
+            return [NotificationChannel(c) for c in channels]
+        return None
+    
+    async def _action_notification(self, rule: AlertRule, action: Dict, 
+                                 event_data: Dict[str, Any],
+                                 channels: Optional[List[NotificationChannel]] = None):
+        """Ação: enviar notificação
+        
+        channels vem pré-convertido de _compilar_regra; se ausente, é
+        convertido a partir da ação.
+        """
+        if channels is None:
+            channels = self._notification_channels(action)
         
         # Criar evento de notificação
         notification = self.notification_service.create_event(
-            type=NotificationType.WARNING if rule.category == AlertCategory.SECURITY 
-                 else NotificationType.INFO,
+            type=rule.notification_type or self._notification_type(rule),
             title=f"Alerta: {rule.name}",
             message=rule.description,
             priority=rule.priority,
@@ -646,57 +1012,123 @@ class AlertEngine:
         logger.info("Agendando arquivamento de dados")
         # TODO: Implementar agendamento de arquivamento
     
-    def _update_last_triggered(self, rule_id: str):
-        """Atualizar última vez que regra foi disparada"""
-        try:
-            with self.SessionLocal() as session:
-                rule = session.query(AlertRuleDB).filter(
-                    AlertRuleDB.id == rule_id
-                ).first()
-                
-                if rule:
-                    rule.last_triggered = datetime.utcnow()
-                    session.commit()
-                    
-                    # Atualizar cache
-                    if rule_id in self.rules_cache:
-                        self.rules_cache[rule_id].last_triggered = rule.last_triggered
-                        
-        except Exception as e:
-            logger.error(f"Erro ao atualizar last_triggered: {e}")
+    def _update_last_triggered(self, rule_id: str, triggered_at: Optional[datetime] = None,
+                               now_mono: Optional[float] = None):
+        """Atualizar última vez que regra foi disparada
+        
+        O cooldown usa apenas a memória; o banco é atualizado em lote por
+        _flush_pending.
+        """
+        self._last_triggered[rule_id] = now_mono if now_mono is not None else time.monotonic()
+        triggered_at = triggered_at or datetime.utcnow()
+        
+        if rule_id in self.rules_cache:
+            self.rules_cache[rule_id].last_triggered = triggered_at
+        
+        self._pending_trigger_updates.append((rule_id, triggered_at))
     
-    def _log_alert_history(self, rule: AlertRule, event_data: Dict[str, Any]):
-        """Registrar alerta no histórico"""
-        try:
-            with self.SessionLocal() as session:
-                history = AlertHistory(
-                    rule_id=rule.id,
-                    event_data=event_data,
-                    matched_conditions=rule.conditions,
-                    actions_taken=rule.actions,
-                    success=True
-                )
-                session.add(history)
-                session.commit()
-                
-        except Exception as e:
-            logger.error(f"Erro ao registrar histórico: {e}")
+    def _flush_trigger_updates(self, session):
+        """Gravar last_triggered pendentes com um único UPDATE (a fila é limpa após o commit)"""
+        pending = dict(self._pending_trigger_updates)
+        if pending:
+            session.execute(
+                update(AlertRuleDB)
+                .where(AlertRuleDB.id.in_(list(pending)))
+                .values(last_triggered=case(pending, value=AlertRuleDB.id))
+            )
+    
+    def _ensure_flush_task(self):
+        """Iniciar _flush_loop no event loop atual, se ainda não estiver rodando"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+    
+    async def _flush_loop(self):
+        """Gravar periodicamente as atualizações pendentes"""
+        while True:
+            await asyncio.sleep(self.flush_interval_s)
+            self._flush_pending()
+    
+    async def close(self):
+        """Parar _flush_loop, gravar o que estiver pendente e fechar o serviço de notificações"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        
+        self._flush_pending()
+        await self.notification_service.close()
+    
+    def _log_alert_history(self, rule: AlertRule, event_data: Dict[str, Any],
+                           triggered_at: Optional[datetime] = None,
+                           now_mono: Optional[float] = None):
+        """Registrar alerta no histórico (gravado em lote)"""
+        if now_mono is None:
+            now_mono = time.monotonic()
+        for window in self._history_windows.values():
+            window.add(now_mono, 0)
+        
+        self._history_buffer.append(AlertHistory(
+            rule_id=rule.id,
+            triggered_at=triggered_at or datetime.utcnow(),
+            event_data=event_data,
+            matched_conditions=rule.conditions,
+            actions_taken=rule.actions,
+            success=True
+        ))
+        
+        if len(self._history_buffer) >= self.flush_batch_size:
+            self._flush_pending()
     
     def add_metric(self, metric_name: str, metric_value: float, 
                   tags: Optional[Dict] = None):
-        """Adicionar métrica para alertas baseados em threshold"""
+        """Adicionar métrica para alertas baseados em threshold (gravada em lote)"""
+        now_mono = time.monotonic()
+        for window in self._metric_windows.get(metric_name, {}).values():
+            window.add(now_mono, metric_value)
+        
+        self._metric_buffer.append(AlertMetrics(
+            metric_name=metric_name,
+            metric_value=metric_value,
+            timestamp=datetime.utcnow(),
+            tags=tags or {}
+        ))
+        
+        if len(self._metric_buffer) >= self.flush_batch_size:
+            self._flush_pending()
+    
+    def _flush_buffer(self, name: str, session):
+        """Adicionar as linhas de um buffer à sessão (o buffer é limpo após o commit)"""
+        rows = getattr(self, name)
+        if rows:
+            session.bulk_save_objects(rows)
+    
+    def _flush_pending(self):
+        """Gravar todas as escritas pendentes em uma sessão e um commit
+        
+        As escritas só saem da fila e dos buffers depois do commit: em erro
+        do banco continuam pendentes para o próximo flush. Nada aqui cede o
+        event loop, então nenhuma linha nova entra entre a gravação e a limpeza.
+        """
+        if not (self._pending_trigger_updates or self._history_buffer or self._metric_buffer):
+            return
+        
         try:
             with self.SessionLocal() as session:
-                metric = AlertMetrics(
-                    metric_name=metric_name,
-                    metric_value=metric_value,
-                    tags=tags or {}
-                )
-                session.add(metric)
+                self._flush_trigger_updates(session)
+                self._flush_buffer('_history_buffer', session)
+                self._flush_buffer('_metric_buffer', session)
                 session.commit()
                 
         except Exception as e:
-            logger.error(f"Erro ao adicionar métrica: {e}")
+            logger.error(f"Erro ao gravar escritas pendentes: {e}")
+            return
+        
+        self._pending_trigger_updates.clear()
+        self._history_buffer = []
+        self._metric_buffer = []
     
     def register_custom_condition(self, name: str, func: Callable):
         """Registrar condição customizada"""
@@ -725,8 +1157,8 @@ class AlertEngine:
                 session.add(db_rule)
                 session.commit()
             
-            # Recarregar cache
-            self._load_rules()
+            # Atualizar cache só com a nova regra
+            self._refresh_rule(rule.id)
             return True
             
         except Exception as e:
@@ -749,8 +1181,8 @@ class AlertEngine:
                     rule.updated_at = datetime.utcnow()
                     session.commit()
                     
-                    # Recarregar cache
-                    self._load_rules()
+                    # Atualizar cache só com a regra alterada
+                    self._refresh_rule(rule_id)
                     return True
                 
                 return False
@@ -761,6 +1193,9 @@ class AlertEngine:
     
     def get_alert_stats(self, days: int = 7) -> Dict:
         """Obter estatísticas de alertas"""
+        # Incluir o histórico ainda no buffer
+        self._flush_pending()
+        
         try:
             since = datetime.utcnow() - timedelta(days=days)
             
@@ -805,22 +1240,90 @@ class AlertEngine:
 
 
 # Worker de processamento
-async def alert_processor(engine: AlertEngine, event_queue: asyncio.Queue):
-    """Processar eventos da fila"""
+def create_alert_queue(maxsize: int = 10_000) -> asyncio.Queue:
+    """Fila de eventos limitada: produtores aguardam quando os workers atrasam"""
+    return asyncio.Queue(maxsize=maxsize)
+
+
+def _decode_events(batch: List[Any]) -> List[Dict[str, Any]]:
+    """Decodificar payloads JSON (bytes/str) da fila; dicts passam direto
+    
+    Payloads inválidos são descartados com log, sem derrubar o lote.
+    """
+    events = []
+    for payload in batch:
+        if isinstance(payload, dict):
+            events.append(payload)
+            continue
+        try:
+            event_data = orjson.loads(payload) if ORJSON_AVAILABLE else json.loads(payload)
+        except ValueError as e:
+            logger.warning(f"Evento inválido descartado: {e}")
+            continue
+        if isinstance(event_data, dict):
+            events.append(event_data)
+        else:
+            logger.warning("Evento inválido descartado: payload não é um objeto JSON")
+    return events
+
+
+async def alert_processor(engine: AlertEngine, event_queue: asyncio.Queue,
+                          max_batch: int = 512):
+    """Processar eventos da fila em lotes de até max_batch
+    
+    A fila aceita dicts ou payloads JSON serializados (bytes/str), que são
+    decodificados aqui com orjson quando disponível.
+    """
+    backoff = 0.01
+    
     while True:
+        # Aguardar um evento e drenar o que já estiver na fila (fora do try:
+        # cancelamento durante a espera propaga normalmente)
+        batch = [await event_queue.get()]
+        while len(batch) < max_batch:
+            try:
+                batch.append(event_queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        
         try:
-            # Obter evento da fila
-            event_data = await event_queue.get()
-            
             # Processar
-            triggered_rules = await engine.process_event(event_data)
+            results = await engine.process_events_batch(_decode_events(batch))
+            triggered_rules = [rule_id for fired in results for rule_id in fired]
             
             if triggered_rules:
                 logger.info(f"Regras disparadas: {triggered_rules}")
             
+            backoff = 0.01
+            
         except Exception as e:
             logger.error(f"Erro no processador de alertas: {e}")
-            await asyncio.sleep(1)
+            # Backoff exponencial com jitter: workers não retomam juntos
+            await asyncio.sleep(min(1.0, backoff) + random.random() * backoff)
+            backoff = min(1.0, backoff * 2)
+        
+        finally:
+            for _ in batch:
+                event_queue.task_done()
+
+
+def start_alert_processors(engine: AlertEngine, event_queue: asyncio.Queue,
+                           workers: int = 4) -> List[asyncio.Task]:
+    """Iniciar workers de alert_processor sobre a mesma fila
+    
+    Os workers são tasks do mesmo event loop: não usam mais de um núcleo,
+    só sobrepõem as esperas de I/O das ações. Por isso o padrão é um número
+    pequeno e fixo (4), independente de os.cpu_count(); aumente apenas se as
+    ações (notificações, webhooks) forem lentas.
+    
+    Retorna as tasks para que o chamador as cancele no encerramento
+    (seguido de engine.close()).
+    """
+    workers = max(1, workers)
+    return [
+        asyncio.create_task(alert_processor(engine, event_queue))
+        for _ in range(workers)
+    ]
 
 
 if __name__ == "__main__":
@@ -836,7 +1339,7 @@ if __name__ == "__main__":
             "event_type": "login_failed",
             "ip_address": "192.168.1.100",
             "username": "admin",
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": time.time_ns()
         }
         
         # Processar
@@ -846,6 +1349,8 @@ if __name__ == "__main__":
         # Estatísticas
         stats = engine.get_alert_stats()
         print(f"Estatísticas: {stats}")
+        
+        await engine.close()
     
     # Executar teste
     asyncio.run(test_alerts())
\ No newline at end of file
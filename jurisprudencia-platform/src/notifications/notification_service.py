@@ -7,25 +7,48 @@ Sistema completo para envio de notificações por múltiplos canais
 import os
 import json
 import asyncio
-from typing import Dict, List, Optional, Union, Any
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Union, Any, Tuple, Set, Coroutine
 from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import smtplib
 import ssl
-from dataclasses import dataclass, asdict
+import tempfile
+from dataclasses import dataclass
 from enum import Enum
 import requests
+import aiohttp
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 from pathlib import Path
 import jinja2
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, JSON, Boolean, Text
+from sqlalchemy import (
+    create_engine, Column, Integer, String, DateTime, JSON, Boolean, Text, Index,
+    event, update, func, and_, or_
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 import aiosmtplib
 from twilio.rest import Client as TwilioClient
 import telegram
-from discord_webhook import DiscordWebhook, DiscordEmbed
+
+# orjson (opcional) serializa o corpo dos webhooks bem mais rápido que o json da stdlib
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# uvloop (opcional) substitui o event loop padrão no processo do worker
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -35,6 +58,36 @@ logger = logging.getLogger(__name__)
 Base = declarative_base()
 
 
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL + synchronous=NORMAL: commits frequentes sem fsync a cada escrita"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
+
+def _create_http_session() -> requests.Session:
+    """Sessão HTTP compartilhada pelos webhooks (Slack, Discord, genérico)
+    
+    Mantém conexões TCP/TLS abertas entre notificações; Retry só repete
+    falhas de conexão em POST, então nenhuma mensagem é duplicada.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=64,
+        max_retries=Retry(total=2, backoff_factor=0.2)
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_HTTP = _create_http_session()
+
+
 class NotificationType(Enum):
     """Tipos de notificação"""
     INFO = "info"
@@ -63,6 +116,38 @@ class NotificationPriority(Enum):
     URGENT = 4
 
 
+# Membros por valor, para reconstruir eventos da fila/log com um acesso a dict
+_TYPE_BY_VALUE = {t.value: t for t in NotificationType}
+_CHANNEL_BY_VALUE = {c.value: c for c in NotificationChannel}
+_PRIORITY_BY_VALUE = {p.value: p for p in NotificationPriority}
+
+# E o caminho inverso, evitando o descritor Enum.value no envio
+_TYPE_VALUE = {t: t.value for t in NotificationType}
+_TYPE_LABEL = {t: t.value.upper() for t in NotificationType}
+_CHANNEL_VALUE = {c: c.value for c in NotificationChannel}
+
+# Cor de cada tipo nos anexos do Slack e embeds do Discord
+_TYPE_COLORS = {
+    NotificationType.INFO: '#0066CC',
+    NotificationType.WARNING: '#FFCC00',
+    NotificationType.ERROR: '#CC0000',
+    NotificationType.CRITICAL: '#990000',
+    NotificationType.SUCCESS: '#006600'
+}
+
+# Canais de chat cujas rajadas são agrupadas em uma única mensagem
+_COALESCE_CHANNELS = frozenset({NotificationChannel.SLACK, NotificationChannel.DISCORD})
+
+# Variável de ambiente que habilita cada canal (DATABASE está sempre ativo)
+_CHANNEL_ENV_VARS = {
+    NotificationChannel.EMAIL: 'SMTP_HOST',
+    NotificationChannel.SLACK: 'SLACK_WEBHOOK_URL',
+    NotificationChannel.TELEGRAM: 'TELEGRAM_BOT_TOKEN',
+    NotificationChannel.SMS: 'TWILIO_ACCOUNT_SID',
+    NotificationChannel.DISCORD: 'DISCORD_WEBHOOK_URL'
+}
+
+
 @dataclass
 class NotificationEvent:
     """Evento de notificação"""
@@ -78,6 +163,30 @@ class NotificationEvent:
     scheduled_at: Optional[datetime] = None
 
 
+def _event_to_dict(event: NotificationEvent) -> Dict[str, Any]:
+    """Evento como dict plano com valores JSON (sem asdict/deepcopy)"""
+    return {
+        'type': _TYPE_VALUE[event.type],
+        'title': event.title,
+        'message': event.message,
+        'priority': event.priority.value,
+        'channels': [_CHANNEL_VALUE[channel] for channel in event.channels or ()],
+        'metadata': event.metadata,
+        'recipient': event.recipient,
+        'template': event.template,
+        'retry_count': event.retry_count,
+        'scheduled_at': event.scheduled_at.isoformat() if event.scheduled_at else None
+    }
+
+
+def _serialize_event(event: NotificationEvent) -> bytes:
+    """Corpo JSON do webhook genérico (valores não serializáveis viram str)"""
+    data = _event_to_dict(event)
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, default=str)
+    return json.dumps(data, default=str, ensure_ascii=False).encode('utf-8')
+
+
 class NotificationLog(Base):
     """Log de notificações enviadas"""
     __tablename__ = 'notification_logs'
@@ -95,6 +204,13 @@ class NotificationLog(Base):
     sent_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     retry_count = Column(Integer, default=0)
+    
+    __table_args__ = (
+        # Estatísticas por período: created_at >= since vira busca por faixa
+        Index('ix_notif_created_status', 'created_at', 'status'),
+        # Retentativas: status == 'failed' AND retry_count/created_at por faixa
+        Index('ix_log_status_retry', 'status', 'retry_count', 'created_at'),
+    )
 
 
 class NotificationQueue(Base):
@@ -121,36 +237,152 @@ class EmailProvider:
         self.from_email = os.getenv('FROM_EMAIL', self.smtp_user)
         self.from_name = os.getenv('FROM_NAME', 'Sistema Jurídico')
         
-        # Templates
+        # Templates (compilados uma vez e mantidos no cache do Environment;
+        # em produção não há verificação de alteração dos arquivos)
         self.template_dir = Path(__file__).parent / 'templates'
         self.template_dir.mkdir(exist_ok=True)
         self.jinja_env = jinja2.Environment(
-            loader=jinja2.FileSystemLoader(str(self.template_dir))
+            loader=jinja2.FileSystemLoader(str(self.template_dir)),
+            auto_reload=os.getenv('ENVIRONMENT', 'development') != 'production',
+            cache_size=400,
+            bytecode_cache=self._bytecode_cache()
+        )
+        
+        # Conexões SMTP autenticadas reaproveitadas entre envios
+        # (evita handshake TLS + AUTH por mensagem); pertencem ao event loop
+        # em que foram abertas
+        self.pool_size = int(os.getenv('SMTP_POOL_SIZE', '4'))
+        self._pool: List[aiosmtplib.SMTP] = []
+        self._pool_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    @staticmethod
+    def _bytecode_cache() -> Optional[jinja2.FileSystemBytecodeCache]:
+        """Cache em disco do bytecode dos templates, reaproveitado entre reinícios"""
+        cache_dir = Path(tempfile.gettempdir()) / 'notif_jinja_cache'
+        try:
+            cache_dir.mkdir(exist_ok=True)
+        except OSError as e:
+            logger.warning(f"Cache de templates desativado: {e}")
+            return None
+        return jinja2.FileSystemBytecodeCache(str(cache_dir), '%s.cache')
+    
+    def _build_message(self, to: str, subject: str, body: str,
+                       html_body: Optional[str] = None) -> MIMEMultipart:
+        """Montar mensagem MIME"""
+        message = MIMEMultipart('alternative')
+        message['Subject'] = subject
+        message['From'] = f"{self.from_name} <{self.from_email}>"
+        message['To'] = to
+        
+        # Adicionar corpo
+        message.attach(MIMEText(body, 'plain'))
+        if html_body:
+            message.attach(MIMEText(html_body, 'html'))
+        
+        return message
+    
+    async def _open_connection(self) -> aiosmtplib.SMTP:
+        """Abrir conexão SMTP com STARTTLS e login"""
+        client = aiosmtplib.SMTP(
+            hostname=self.smtp_host,
+            port=self.smtp_port,
+            start_tls=True
         )
+        await client.connect()
+        if self.smtp_user:
+            try:
+                await client.login(self.smtp_user, self.smtp_password)
+            except BaseException:
+                client.close()
+                raise
+        return client
+    
+    @asynccontextmanager
+    async def connection(self):
+        """Conexão SMTP do pool (aberta sob demanda, devolvida ao final)
+        
+        Para workers de longa duração:
+        ``async with provider.connection() as client: await client.send_message(...)``
+        """
+        self._check_pool_loop()
+        client = None
+        while self._pool and client is None:
+            candidate = self._pool.pop()
+            if candidate.is_connected:
+                client = candidate
+        if client is None:
+            client = await self._open_connection()
+        
+        try:
+            yield client
+        except BaseException:
+            # Estado da conexão desconhecido: descartar
+            client.close()
+            raise
+        
+        if client.is_connected and len(self._pool) < self.pool_size:
+            self._pool.append(client)
+        else:
+            await self._quit(client)
+    
+    @staticmethod
+    async def _quit(client: aiosmtplib.SMTP):
+        """Encerrar conexão SMTP sem propagar erros"""
+        try:
+            await client.quit()
+        except Exception:
+            client.close()
+    
+    def _check_pool_loop(self):
+        """Descartar o pool se ele foi aberto em outro event loop (ex.: outro asyncio.run)"""
+        loop = asyncio.get_running_loop()
+        if self._pool_loop is not loop:
+            self._drop_pool()
+            self._pool_loop = loop
+    
+    def _drop_pool(self):
+        """Fechar as conexões do pool sem usar o event loop atual
+        
+        Com o loop de origem ainda ativo o fechamento é agendado nele; se ele
+        já foi encerrado, as conexões não têm mais como ser usadas e só são
+        descartadas.
+        """
+        pool, loop = self._pool, self._pool_loop
+        self._pool = []
+        for client in pool:
+            if loop is not None and not loop.is_closed():
+                loop.call_soon_threadsafe(client.close)
+            else:
+                try:
+                    client.close()
+                except RuntimeError:
+                    pass
+    
+    async def close(self):
+        """Encerrar as conexões do pool"""
+        if self._pool_loop is not asyncio.get_running_loop():
+            self._drop_pool()
+            return
+        pool, self._pool = self._pool, []
+        for client in pool:
+            await self._quit(client)
     
     async def send_async(self, to: str, subject: str, body: str, 
                         html_body: Optional[str] = None) -> bool:
-        """Enviar email assíncrono"""
+        """Enviar email assíncrono (reaproveitando conexão do pool)"""
         try:
-            message = MIMEMultipart('alternative')
-            message['Subject'] = subject
-            message['From'] = f"{self.from_name} <{self.from_email}>"
-            message['To'] = to
-            
-            # Adicionar corpo
-            message.attach(MIMEText(body, 'plain'))
-            if html_body:
-                message.attach(MIMEText(html_body, 'html'))
-            
-            # Enviar
-            await aiosmtplib.send(
-                message,
-                hostname=self.smtp_host,
-                port=self.smtp_port,
-                username=self.smtp_user,
-                password=self.smtp_password,
-                start_tls=True
-            )
+            message = self._build_message(to, subject, body, html_body)
+            
+            # Enviar; conexão do pool derrubada pelo servidor é refeita uma vez
+            for attempt in range(2):
+                try:
+                    async with self.connection() as client:
+                        await client.send_message(message)
+                    break
+                except aiosmtplib.SMTPServerDisconnected:
+                    if attempt:
+                        raise
+                    await self.close()
             
             logger.info(f"Email enviado para {to}: {subject}")
             return True
@@ -159,19 +391,38 @@ class EmailProvider:
             logger.error(f"Erro ao enviar email: {e}")
             return False
     
+    async def send_many_async(self, messages: List[Tuple[str, str, str, Optional[str]]]) -> List[bool]:
+        """Enviar lote de emails (to, subject, body, html_body) por uma única conexão
+        
+        Recusas do servidor afetam só a mensagem; se a conexão cair, as
+        restantes são marcadas como falha.
+        """
+        results: List[bool] = []
+        try:
+            async with self.connection() as client:
+                for to, subject, body, html_body in messages:
+                    try:
+                        await client.send_message(
+                            self._build_message(to, subject, body, html_body)
+                        )
+                        results.append(True)
+                    except (aiosmtplib.SMTPRecipientsRefused,
+                            aiosmtplib.SMTPResponseException) as e:
+                        logger.error(f"Erro ao enviar email para {to}: {e}")
+                        results.append(False)
+            
+            logger.info(f"Lote de emails enviado: {sum(results)}/{len(messages)}")
+            
+        except Exception as e:
+            logger.error(f"Erro ao enviar lote de emails: {e}")
+        
+        return results + [False] * (len(messages) - len(results))
+    
     def send_sync(self, to: str, subject: str, body: str, 
                   html_body: Optional[str] = None) -> bool:
         """Enviar email síncrono"""
         try:
-            message = MIMEMultipart('alternative')
-            message['Subject'] = subject
-            message['From'] = f"{self.from_name} <{self.from_email}>"
-            message['To'] = to
-            
-            # Adicionar corpo
-            message.attach(MIMEText(body, 'plain'))
-            if html_body:
-                message.attach(MIMEText(html_body, 'html'))
+            message = self._build_message(to, subject, body, html_body)
             
             # Conectar e enviar
             context = ssl.create_default_context()
@@ -196,6 +447,19 @@ class SlackProvider:
         self.webhook_url = os.getenv('SLACK_WEBHOOK_URL', '')
         self.default_channel = os.getenv('SLACK_CHANNEL', '#alertas')
     
+    def _payload(self, message: str, channel: Optional[str] = None,
+                 attachments: Optional[List[Dict]] = None) -> Dict:
+        """Montar payload do webhook"""
+        payload = {
+            'text': message,
+            'channel': channel or self.default_channel
+        }
+        
+        if attachments:
+            payload['attachments'] = attachments
+        
+        return payload
+    
     def send(self, message: str, channel: Optional[str] = None,
              attachments: Optional[List[Dict]] = None) -> bool:
         """Enviar mensagem para Slack"""
@@ -204,17 +468,9 @@ class SlackProvider:
                 logger.warning("Slack webhook não configurado")
                 return False
             
-            payload = {
-                'text': message,
-                'channel': channel or self.default_channel
-            }
-            
-            if attachments:
-                payload['attachments'] = attachments
-            
-            response = requests.post(
+            response = _HTTP.post(
                 self.webhook_url,
-                json=payload,
+                json=self._payload(message, channel, attachments),
                 timeout=10
             )
             
@@ -223,6 +479,25 @@ class SlackProvider:
         except Exception as e:
             logger.error(f"Erro ao enviar para Slack: {e}")
             return False
+    
+    async def send_async(self, session: aiohttp.ClientSession, message: str,
+                         channel: Optional[str] = None,
+                         attachments: Optional[List[Dict]] = None) -> bool:
+        """Enviar mensagem para Slack sem bloquear o event loop"""
+        try:
+            if not self.webhook_url:
+                logger.warning("Slack webhook não configurado")
+                return False
+            
+            async with session.post(
+                self.webhook_url,
+                json=self._payload(message, channel, attachments)
+            ) as response:
+                return response.status == 200
+            
+        except Exception as e:
+            logger.error(f"Erro ao enviar para Slack: {e}")
+            return False
 
 
 class TelegramProvider:
@@ -232,10 +507,19 @@ class TelegramProvider:
         self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN', '')
         self.default_chat_id = os.getenv('TELEGRAM_CHAT_ID', '')
         
+        # Bot assíncrono (python-telegram-bot >= 20): o cliente HTTP é criado
+        # uma vez e reaproveitado; initialize() roda no primeiro envio
         if self.bot_token:
             self.bot = telegram.Bot(token=self.bot_token)
         else:
             self.bot = None
+        self._initialized = False
+    
+    async def close(self):
+        """Encerrar o cliente HTTP do bot"""
+        if self._initialized:
+            self._initialized = False
+            await self.bot.shutdown()
     
     async def send_async(self, message: str, chat_id: Optional[str] = None,
                         parse_mode: str = 'HTML') -> bool:
@@ -245,6 +529,10 @@ class TelegramProvider:
                 logger.warning("Bot Telegram não configurado")
                 return False
             
+            if not self._initialized:
+                await self.bot.initialize()
+                self._initialized = True
+            
             await self.bot.send_message(
                 chat_id=chat_id or self.default_chat_id,
                 text=message,
@@ -293,6 +581,11 @@ class SMSProvider:
         except Exception as e:
             logger.error(f"Erro ao enviar SMS: {e}")
             return False
+    
+    async def send_async(self, to: str, message: str) -> bool:
+        """Enviar SMS em thread (cliente REST do Twilio é bloqueante; a
+        sessão HTTP do cliente, criado no __init__, é reaproveitada)"""
+        return await asyncio.to_thread(self.send, to, message)
 
 
 class DiscordProvider:
@@ -301,6 +594,28 @@ class DiscordProvider:
     def __init__(self):
         self.webhook_url = os.getenv('DISCORD_WEBHOOK_URL', '')
     
+    @staticmethod
+    def _payload(title: str, description: str,
+                 color: Optional[str] = None, fields: Optional[List[Dict]] = None) -> Dict:
+        """Montar payload da API de webhooks (um embed)"""
+        embed = {
+            'title': title,
+            'description': description,
+            'color': int((color or 'FF0000').lstrip('#'), 16)
+        }
+        
+        if fields:
+            embed['fields'] = [
+                {
+                    'name': field.get('name', ''),
+                    'value': field.get('value', ''),
+                    'inline': field.get('inline', False)
+                }
+                for field in fields
+            ]
+        
+        return {'embeds': [embed]}
+    
     def send(self, title: str, description: str, 
              color: Optional[str] = None, fields: Optional[List[Dict]] = None) -> bool:
         """Enviar mensagem para Discord"""
@@ -309,27 +624,33 @@ class DiscordProvider:
                 logger.warning("Discord webhook não configurado")
                 return False
             
-            webhook = DiscordWebhook(url=self.webhook_url)
-            
-            # Criar embed
-            embed = DiscordEmbed(
-                title=title,
-                description=description,
-                color=color or 'FF0000'
+            response = _HTTP.post(
+                self.webhook_url,
+                json=self._payload(title, description, color, fields),
+                timeout=10
             )
             
-            if fields:
-                for field in fields:
-                    embed.add_embed_field(
-                        name=field.get('name', ''),
-                        value=field.get('value', ''),
-                        inline=field.get('inline', False)
-                    )
+            # Discord responde 204 (sem corpo) quando não se pede ?wait=true
+            return response.status_code in (200, 204)
             
-            webhook.add_embed(embed)
-            response = webhook.execute()
+        except Exception as e:
+            logger.error(f"Erro ao enviar para Discord: {e}")
+            return False
+    
+    async def send_async(self, session: aiohttp.ClientSession, title: str, description: str,
+                         color: Optional[str] = None,
+                         fields: Optional[List[Dict]] = None) -> bool:
+        """Enviar mensagem para Discord sem bloquear o event loop"""
+        try:
+            if not self.webhook_url:
+                logger.warning("Discord webhook não configurado")
+                return False
             
-            return response.status_code == 200
+            async with session.post(
+                self.webhook_url,
+                json=self._payload(title, description, color, fields)
+            ) as response:
+                return response.status in (200, 204)
             
         except Exception as e:
             logger.error(f"Erro ao enviar para Discord: {e}")
@@ -339,12 +660,27 @@ class DiscordProvider:
 class NotificationService:
     """Serviço principal de notificações"""
     
+    # Templates padrão já gravados neste processo
+    _templates_ready = False
+    
     def __init__(self, db_url: Optional[str] = None):
         # Configurar banco
         if not db_url:
             db_url = os.getenv('DATABASE_URL', 'sqlite:///notifications.db')
         
-        self.engine = create_engine(db_url)
+        if db_url.startswith('sqlite'):
+            self.engine = create_engine(db_url)
+            event.listen(self.engine, 'connect', _sqlite_pragmas)
+        else:
+            # Pool dimensionado para os envios concorrentes; pre_ping/recycle
+            # descartam conexões derrubadas pelo servidor
+            self.engine = create_engine(
+                db_url,
+                pool_size=20,
+                max_overflow=40,
+                pool_pre_ping=True,
+                pool_recycle=1800
+            )
         Base.metadata.create_all(self.engine)
         self.SessionLocal = sessionmaker(bind=self.engine)
         
@@ -363,9 +699,62 @@ class NotificationService:
         # Configurações
         self.retry_delays = [60, 300, 900]  # 1min, 5min, 15min
         self.max_retries = 3
+        self.scheduled_batch_size = 64  # agendadas por commit
+        self.max_concurrent_sends = 32  # envios simultâneos ao drenar a fila
+        self.retry_batch_size = 500  # retentativas por commit
+        
+        # Sequência que desempata IDs gerados no mesmo nanossegundo
+        self._seq = itertools.count()
+        
+        # Sessão aiohttp dos webhooks, recriada quando o event loop muda
+        self._http_session: Optional[aiohttp.ClientSession] = None
+        self._http_session_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Canais padrão por (tipo, prioridade), resolvidos uma vez: a
+        # configuração vem do ambiente, que não muda durante o processo
+        configured = frozenset(
+            channel for channel, env_var in _CHANNEL_ENV_VARS.items() if os.getenv(env_var)
+        ) | {NotificationChannel.DATABASE}
+        self._default_channels = {
+            (type, priority): tuple(
+                channel for channel in self._channels_for(type, priority)
+                if channel in configured
+            )
+            for type in NotificationType
+            for priority in NotificationPriority
+        }
+        
+        # Partes fixas da formatação por tipo, montadas uma vez
+        self._header_prefix = {t: f"{label}: " for t, label in _TYPE_LABEL.items()}
+        self._slack_prefix = {t: f"*{label}*: " for t, label in _TYPE_LABEL.items()}
+        self._slack_attachment = {
+            t: {'color': self._get_color_for_type(t), 'footer': 'Sistema Jurídico'}
+            for t in NotificationType
+        }
+        
+        # Agrupamento de rajadas por (canal, tipo) em Slack/Discord: eventos
+        # dentro da janela viram uma mensagem só (URGENT nunca espera).
+        # Desativado por padrão (0): o envio aguarda a janela, então só o
+        # worker de longa duração o liga (ver notification_worker)
+        self.coalesce_window_s = float(os.getenv('NOTIFICATION_COALESCE_WINDOW', '0'))
+        self.coalesce_max_batch = 25  # limite de campos de um embed do Discord
+        self._coalesce_buffers: Dict[Tuple[NotificationChannel, NotificationType],
+                                     List[Tuple[str, NotificationEvent, asyncio.Future]]] = {}
+        self._coalesce_timers: Dict[Tuple[NotificationChannel, NotificationType], asyncio.Task] = {}
+        self._coalesce_tasks: Set[asyncio.Task] = set()
+        
+        # Logs de envio acumulados e gravados em lote (um INSERT + commit):
+        # ao atingir log_flush_size ou, em segundo plano, a cada log_flush_interval_s
+        self._log_buffer: List[Dict[str, Any]] = []
+        self.log_flush_size = 200
+        self.log_flush_interval_s = 2.0
+        self._log_flush_task: Optional[asyncio.Task] = None
     
     def _create_default_templates(self):
-        """Criar templates padrão"""
+        """Criar templates padrão (uma vez por processo)"""
+        if NotificationService._templates_ready:
+            return
+        
         template_dir = Path(__file__).parent / 'templates'
         template_dir.mkdir(exist_ok=True)
         
@@ -417,7 +806,12 @@ class NotificationService:
 </html>
         """
         
-        (template_dir / 'email_base.html').write_text(base_template)
+        # Só grava se ausente (não sobrescreve um template customizado)
+        base_path = template_dir / 'email_base.html'
+        if not base_path.exists():
+            base_path.write_text(base_template)
+        
+        NotificationService._templates_ready = True
     
     def create_event(self, **kwargs) -> NotificationEvent:
         """Criar evento de notificação"""
@@ -431,28 +825,165 @@ class NotificationService:
         channels = event.channels or self._get_default_channels(event.type, event.priority)
         
         # Gerar ID único
-        event_id = f"{datetime.utcnow().timestamp()}_{event.type.value}"
+        event_id = f"{time.time_ns()}_{next(self._seq)}_{_TYPE_VALUE[event.type]}"
         
-        # Processar cada canal
-        for channel in channels:
-            try:
-                success = await self._send_to_channel(event, channel)
-                results[channel.value] = success
-                
-                # Registrar no log
-                self._log_notification(
-                    event_id=event_id,
-                    event=event,
-                    channel=channel,
-                    success=success
-                )
-                
-            except Exception as e:
-                logger.error(f"Erro ao enviar para {channel.value}: {e}")
-                results[channel.value] = False
+        # Processar os canais em paralelo: latência do canal mais lento, não a soma;
+        # falha inesperada em um canal não descarta o resultado dos outros
+        outcomes = await asyncio.gather(*(
+            self._dispatch_channel(event_id, event, channel) for channel in channels
+        ), return_exceptions=True)
+        
+        for channel, success in zip(channels, outcomes):
+            if isinstance(success, Exception):
+                logger.error(f"Erro ao enviar para {channel.value}: {success}")
+                success = False
+            results[_CHANNEL_VALUE[channel]] = success
         
         return results
     
+    async def _dispatch_channel(self, event_id: str, event: NotificationEvent,
+                                channel: NotificationChannel) -> bool:
+        """Enviar para um canal e registrar o resultado
+        
+        Em canais agrupados aguarda o envio do lote e retorna o resultado dele.
+        """
+        if (self.coalesce_window_s > 0 and channel in _COALESCE_CHANNELS
+                and event.priority != NotificationPriority.URGENT):
+            return await self._coalesce(event_id, event, channel)
+        
+        try:
+            success = await self._send_to_channel(event, channel)
+            
+            # Registrar no log
+            self._log_notification(
+                event_id=event_id,
+                event=event,
+                channel=channel,
+                success=success
+            )
+            
+            return success
+            
+        except Exception as e:
+            logger.error(f"Erro ao enviar para {channel.value}: {e}")
+            return False
+    
+    def _coalesce(self, event_id: str, event: NotificationEvent,
+                  channel: NotificationChannel) -> asyncio.Future:
+        """Acumular evento no buffer do (canal, tipo)
+        
+        Retorna um future resolvido com o resultado do envio do lote.
+        """
+        future = asyncio.get_running_loop().create_future()
+        key = (channel, event.type)
+        buffer = self._coalesce_buffers.setdefault(key, [])
+        buffer.append((event_id, event, future))
+        
+        if len(buffer) >= self.coalesce_max_batch:
+            # Lote cheio: enviar já e descartar o timer da janela
+            timer = self._coalesce_timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+            self._spawn(self._send_coalesced(channel, self._coalesce_buffers.pop(key)))
+        elif len(buffer) == 1:
+            # Primeiro evento da janela: agendar o envio
+            self._coalesce_timers[key] = self._spawn(self._flush_coalesced_after(key))
+        
+        return future
+    
+    def _spawn(self, coro) -> asyncio.Task:
+        """Criar task mantendo referência até terminar"""
+        task = asyncio.get_running_loop().create_task(coro)
+        self._coalesce_tasks.add(task)
+        task.add_done_callback(self._coalesce_tasks.discard)
+        return task
+    
+    async def _flush_coalesced_after(self, key: Tuple[NotificationChannel, NotificationType]):
+        """Enviar o buffer do (canal, tipo) ao fim da janela"""
+        await asyncio.sleep(self.coalesce_window_s)
+        self._coalesce_timers.pop(key, None)
+        entries = self._coalesce_buffers.pop(key, None)
+        if entries:
+            await self._send_coalesced(key[0], entries)
+    
+    async def _send_coalesced(self, channel: NotificationChannel,
+                              entries: List[Tuple[str, NotificationEvent, asyncio.Future]]):
+        """Enviar eventos agrupados, registrar cada um no log e resolver os futures"""
+        try:
+            if len(entries) == 1:
+                success = await self._send_to_channel(entries[0][1], channel)
+            else:
+                success = await self._send_batch_to_channel(
+                    channel, [event for _, event, _ in entries]
+                )
+        except Exception as e:
+            logger.error(f"Erro ao enviar para {channel.value}: {e}")
+            success = False
+        
+        for event_id, event, future in entries:
+            self._log_notification(
+                event_id=event_id,
+                event=event,
+                channel=channel,
+                success=success
+            )
+            if not future.done():
+                future.set_result(success)
+    
+    async def _send_batch_to_channel(self, channel: NotificationChannel,
+                                     events: List[NotificationEvent]) -> bool:
+        """Enviar vários eventos do mesmo tipo como uma única mensagem"""
+        type = events[0].type
+        summary = f"{len(events)} notificações"
+        provider = self.providers[channel]
+        
+        if channel == NotificationChannel.SLACK:
+            attachment = dict(
+                self._slack_attachment[type],
+                title=summary,
+                fields=[
+                    {'title': event.title, 'value': event.message, 'short': False}
+                    for event in events
+                ],
+                ts=time.time()
+            )
+            
+            return await provider.send_async(
+                self._get_http_session(),
+                message=self._slack_prefix[type] + summary,
+                attachments=[attachment]
+            )
+        
+        elif channel == NotificationChannel.DISCORD:
+            # Limites da API: 256 caracteres no nome e 1024 no valor do campo
+            return await provider.send_async(
+                self._get_http_session(),
+                title=self._header_prefix[type] + summary,
+                description='',
+                color=self._get_color_for_type(type),
+                fields=[
+                    {'name': event.title[:256], 'value': event.message[:1024], 'inline': False}
+                    for event in events
+                ]
+            )
+        
+        logger.warning(f"Canal sem envio agrupado: {channel}")
+        return False
+    
+    async def _flush_coalesced(self):
+        """Enviar imediatamente tudo o que estiver agrupado e aguardar envios em curso"""
+        timers, self._coalesce_timers = self._coalesce_timers, {}
+        for timer in timers.values():
+            timer.cancel()
+        
+        buffers, self._coalesce_buffers = self._coalesce_buffers, {}
+        await asyncio.gather(
+            *(self._send_coalesced(channel, entries)
+              for (channel, _), entries in buffers.items()),
+            *list(self._coalesce_tasks),
+            return_exceptions=True
+        )
+    
     async def _send_to_channel(self, event: NotificationEvent, 
                               channel: NotificationChannel) -> bool:
         """Enviar para canal específico"""
@@ -476,22 +1007,22 @@ class NotificationService:
             elif channel == NotificationChannel.SLACK:
                 provider = self.providers[channel]
                 
-                # Formatar mensagem
-                attachments = [{
-                    'color': self._get_color_for_type(event.type),
-                    'title': event.title,
-                    'text': event.message,
-                    'fields': [
+                # Formatar mensagem (cor e rodapé vêm do esqueleto do tipo)
+                attachment = dict(
+                    self._slack_attachment[event.type],
+                    title=event.title,
+                    text=event.message,
+                    fields=[
                         {'title': k, 'value': str(v), 'short': True}
                         for k, v in (event.metadata or {}).items()
                     ],
-                    'footer': 'Sistema Jurídico',
-                    'ts': datetime.utcnow().timestamp()
-                }]
+                    ts=time.time()
+                )
                 
-                return provider.send(
-                    message=f"*{event.type.value.upper()}*: {event.title}",
-                    attachments=attachments
+                return await provider.send_async(
+                    self._get_http_session(),
+                    message=self._slack_prefix[event.type] + event.title,
+                    attachments=[attachment]
                 )
             
             elif channel == NotificationChannel.TELEGRAM:
@@ -499,7 +1030,7 @@ class NotificationService:
                 
                 # Formatar mensagem HTML
                 message = f"""
-<b>{event.type.value.upper()}: {event.title}</b>
+<b>{self._header_prefix[event.type]}{event.title}</b>
 
 {event.message}
 
@@ -512,9 +1043,9 @@ class NotificationService:
                 provider = self.providers[channel]
                 
                 # Mensagem curta para SMS
-                message = f"{event.type.value.upper()}: {event.title} - {event.message}"
+                message = f"{self._header_prefix[event.type]}{event.title} - {event.message}"
                 
-                return provider.send(
+                return await provider.send_async(
                     to=event.recipient or os.getenv('DEFAULT_SMS_RECIPIENT', ''),
                     message=message
                 )
@@ -529,8 +1060,9 @@ class NotificationService:
                         for k, v in event.metadata.items()
                     ]
                 
-                return provider.send(
-                    title=f"{event.type.value.upper()}: {event.title}",
+                return await provider.send_async(
+                    self._get_http_session(),
+                    title=self._header_prefix[event.type] + event.title,
                     description=event.message,
                     color=self._get_color_for_type(event.type),
                     fields=fields
@@ -544,12 +1076,12 @@ class NotificationService:
                 # Enviar para webhook genérico
                 webhook_url = os.getenv('GENERIC_WEBHOOK_URL', '')
                 if webhook_url:
-                    response = requests.post(
+                    async with self._get_http_session().post(
                         webhook_url,
-                        json=asdict(event),
-                        timeout=10
-                    )
-                    return response.status_code < 400
+                        data=_serialize_event(event),
+                        headers={'Content-Type': 'application/json'}
+                    ) as response:
+                        return response.status < 400
                 return False
             
             else:
@@ -560,9 +1092,55 @@ class NotificationService:
             logger.error(f"Erro ao enviar para {channel.value}: {e}")
             return False
     
+    def _get_http_session(self) -> aiohttp.ClientSession:
+        """Sessão aiohttp compartilhada pelos webhooks (keep-alive entre envios)
+        
+        A sessão só vale no event loop em que foi criada: em outro loop (ex.:
+        um novo asyncio.run) ela é fechada e uma nova é criada.
+        """
+        loop = asyncio.get_running_loop()
+        if self._http_session is not None and self._http_session_loop is not loop:
+            closing = self._release_http_session()
+            if closing is not None:
+                self._spawn(closing)
+        
+        if self._http_session is None or self._http_session.closed:
+            self._http_session_loop = loop
+            self._http_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=100,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=30
+                ),
+                timeout=aiohttp.ClientTimeout(total=10)
+            )
+        return self._http_session
+    
+    def _release_http_session(self) -> Optional[Coroutine[Any, Any, None]]:
+        """Soltar a sessão aiohttp e devolver o fechamento a aguardar no loop atual
+        
+        Sessão do loop atual ou de um loop já encerrado (cujas conexões
+        morreram com ele) é fechada no loop atual; a de outro loop ainda
+        ativo tem o fechamento agendado nele.
+        """
+        session, loop = self._http_session, self._http_session_loop
+        self._http_session = self._http_session_loop = None
+        if session is None or session.closed:
+            return None
+        if loop is asyncio.get_running_loop() or loop.is_closed():
+            return session.close()
+        asyncio.run_coroutine_threadsafe(session.close(), loop)
+        return None
+    
     def _get_default_channels(self, type: NotificationType, 
-                            priority: NotificationPriority) -> List[NotificationChannel]:
-        """Determinar canais padrão baseado no tipo e prioridade"""
+                            priority: NotificationPriority) -> Tuple[NotificationChannel, ...]:
+        """Determinar canais padrão baseado no tipo e prioridade (já filtrados)"""
+        return self._default_channels[(type, priority)]
+    
+    @staticmethod
+    def _channels_for(type: NotificationType,
+                      priority: NotificationPriority) -> List[NotificationChannel]:
+        """Canais desejados para tipo e prioridade, antes de filtrar os configurados"""
         channels = [NotificationChannel.DATABASE]
         
         if priority == NotificationPriority.URGENT:
@@ -585,34 +1163,11 @@ class NotificationService:
         else:
             channels.append(NotificationChannel.SLACK)
         
-        # Filtrar apenas canais configurados
-        configured_channels = []
-        for channel in channels:
-            if channel == NotificationChannel.DATABASE:
-                configured_channels.append(channel)
-            elif channel == NotificationChannel.EMAIL and os.getenv('SMTP_HOST'):
-                configured_channels.append(channel)
-            elif channel == NotificationChannel.SLACK and os.getenv('SLACK_WEBHOOK_URL'):
-                configured_channels.append(channel)
-            elif channel == NotificationChannel.TELEGRAM and os.getenv('TELEGRAM_BOT_TOKEN'):
-                configured_channels.append(channel)
-            elif channel == NotificationChannel.SMS and os.getenv('TWILIO_ACCOUNT_SID'):
-                configured_channels.append(channel)
-            elif channel == NotificationChannel.DISCORD and os.getenv('DISCORD_WEBHOOK_URL'):
-                configured_channels.append(channel)
-        
-        return configured_channels
+        return channels
     
     def _get_color_for_type(self, type: NotificationType) -> str:
         """Obter cor para tipo de notificação"""
-        colors = {
-            NotificationType.INFO: '#0066CC',
-            NotificationType.WARNING: '#FFCC00',
-            NotificationType.ERROR: '#CC0000',
-            NotificationType.CRITICAL: '#990000',
-            NotificationType.SUCCESS: '#006600'
-        }
-        return colors.get(type, '#666666')
+        return _TYPE_COLORS.get(type, '#666666')
     
     def _format_metadata_telegram(self, metadata: Optional[Dict]) -> str:
         """Formatar metadata para Telegram"""
@@ -628,17 +1183,17 @@ class NotificationService:
     def _render_template(self, event: NotificationEvent) -> str:
         """Renderizar template"""
         try:
-            template_path = Path(__file__).parent / 'templates' / f"{event.template}.html"
+            jinja_env = self.providers[NotificationChannel.EMAIL].jinja_env
             
-            if not template_path.exists():
-                template_path = Path(__file__).parent / 'templates' / 'email_base.html'
-            
-            template = jinja2.Template(template_path.read_text())
+            try:
+                template = jinja_env.get_template(f"{event.template}.html")
+            except jinja2.TemplateNotFound:
+                template = jinja_env.get_template('email_base.html')
             
             return template.render(
                 title=event.title,
                 message=event.message,
-                type=event.type.value,
+                type=_TYPE_VALUE[event.type],
                 metadata=event.metadata,
                 timestamp=datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
             )
@@ -649,22 +1204,55 @@ class NotificationService:
     
     def _log_notification(self, event_id: str, event: NotificationEvent,
                          channel: NotificationChannel, success: bool):
-        """Registrar notificação no banco"""
+        """Registrar notificação no banco (gravado em lote)"""
+        now = datetime.utcnow()
+        self._log_buffer.append({
+            'event_id': event_id,
+            'type': _TYPE_VALUE[event.type],
+            'channel': _CHANNEL_VALUE[channel],
+            'recipient': event.recipient or 'default',
+            'title': event.title,
+            'message': event.message,
+            'metadata': event.metadata,
+            'status': 'sent' if success else 'failed',
+            'sent_at': now if success else None,
+            'created_at': now,
+            'retry_count': event.retry_count
+        })
+        
+        if len(self._log_buffer) >= self.log_flush_size:
+            self._flush_logs()
+        else:
+            self._ensure_log_flush_task()
+    
+    def _ensure_log_flush_task(self):
+        """Iniciar _log_flush_loop no event loop atual, se ainda não estiver rodando"""
+        if self._log_flush_task is None or self._log_flush_task.done():
+            self._log_flush_task = asyncio.get_running_loop().create_task(self._log_flush_loop())
+    
+    async def _log_flush_loop(self):
+        """Gravar periodicamente os logs pendentes
+        
+        Ao ser cancelado (close() ou fim do asyncio.run) grava o que restou.
+        """
+        try:
+            while True:
+                await asyncio.sleep(self.log_flush_interval_s)
+                self._flush_logs()
+        finally:
+            self._flush_logs()
+    
+    def _flush_logs(self):
+        """Gravar os logs pendentes com um único INSERT e um commit"""
+        rows = self._log_buffer
+        if not rows:
+            return
+        
+        # Trocar a lista antes de gravar: novos registros vão para a nova
+        self._log_buffer = []
         try:
             with self.SessionLocal() as session:
-                log = NotificationLog(
-                    event_id=event_id,
-                    type=event.type.value,
-                    channel=channel.value,
-                    recipient=event.recipient or 'default',
-                    title=event.title,
-                    message=event.message,
-                    metadata=event.metadata,
-                    status='sent' if success else 'failed',
-                    sent_at=datetime.utcnow() if success else None,
-                    retry_count=event.retry_count
-                )
-                session.add(log)
+                session.execute(NotificationLog.__table__.insert(), rows)
                 session.commit()
                 
         except Exception as e:
@@ -674,12 +1262,12 @@ class NotificationService:
                             send_at: datetime) -> str:
         """Agendar notificação"""
         try:
-            event_id = f"scheduled_{datetime.utcnow().timestamp()}"
+            event_id = f"scheduled_{time.time_ns()}_{next(self._seq)}"
             
             with self.SessionLocal() as session:
                 queue_item = NotificationQueue(
                     event_id=event_id,
-                    event_data=asdict(event),
+                    event_data=_event_to_dict(event),
                     priority=event.priority.value,
                     scheduled_at=send_at
                 )
@@ -693,8 +1281,27 @@ class NotificationService:
             logger.error(f"Erro ao agendar notificação: {e}")
             return ""
     
+    @staticmethod
+    def _event_from_data(event_data: Dict[str, Any]) -> NotificationEvent:
+        """Reconstruir evento a partir do JSON da fila"""
+        return NotificationEvent(
+            type=_TYPE_BY_VALUE[event_data['type']],
+            title=event_data['title'],
+            message=event_data['message'],
+            priority=_PRIORITY_BY_VALUE[event_data.get('priority', 2)],
+            channels=[_CHANNEL_BY_VALUE[c] for c in event_data.get('channels') or ()],
+            metadata=event_data.get('metadata'),
+            recipient=event_data.get('recipient'),
+            template=event_data.get('template')
+        )
+    
     async def process_scheduled_notifications(self):
-        """Processar notificações agendadas"""
+        """Processar notificações agendadas
+        
+        Cada lote de scheduled_batch_size itens é enviado em paralelo (até
+        max_concurrent_sends envios simultâneos) e marcado como processado
+        com um único UPDATE + commit.
+        """
         try:
             with self.SessionLocal() as session:
                 # Buscar notificações pendentes
@@ -706,140 +1313,215 @@ class NotificationService:
                     NotificationQueue.scheduled_at
                 ).all()
                 
-                for item in pending:
-                    try:
-                        # Reconstruir evento
-                        event_data = item.event_data
-                        event = NotificationEvent(
-                            type=NotificationType(event_data['type']),
-                            title=event_data['title'],
-                            message=event_data['message'],
-                            priority=NotificationPriority(event_data.get('priority', 2)),
-                            channels=[NotificationChannel(c) for c in event_data.get('channels', [])],
-                            metadata=event_data.get('metadata'),
-                            recipient=event_data.get('recipient'),
-                            template=event_data.get('template')
+                semaphore = asyncio.Semaphore(self.max_concurrent_sends)
+                
+                async def send(event: NotificationEvent):
+                    async with semaphore:
+                        return await self.send_notification(event)
+                
+                for start in range(0, len(pending), self.scheduled_batch_size):
+                    items, events = [], []
+                    for item in pending[start:start + self.scheduled_batch_size]:
+                        try:
+                            events.append(self._event_from_data(item.event_data))
+                            items.append(item)
+                        except Exception as e:
+                            logger.error(f"Erro ao processar notificação {item.event_id}: {e}")
+                    
+                    results = await asyncio.gather(
+                        *(send(event) for event in events), return_exceptions=True
+                    )
+                    
+                    processed_ids = []
+                    for item, result in zip(items, results):
+                        if isinstance(result, BaseException):
+                            logger.error(f"Erro ao processar notificação {item.event_id}: {result}")
+                        else:
+                            processed_ids.append(item.id)
+                    
+                    # Marcar lote como processado
+                    if processed_ids:
+                        session.execute(
+                            update(NotificationQueue)
+                            .where(NotificationQueue.id.in_(processed_ids))
+                            .values(processed=True)
                         )
-                        
-                        # Enviar
-                        await self.send_notification(event)
-                        
-                        # Marcar como processado
-                        item.processed = True
                         session.commit()
                         
-                    except Exception as e:
-                        logger.error(f"Erro ao processar notificação {item.event_id}: {e}")
-                        
         except Exception as e:
             logger.error(f"Erro ao processar fila: {e}")
     
     async def retry_failed_notifications(self):
-        """Retentar notificações falhas"""
+        """Retentar notificações falhas cujo atraso já venceu
+        
+        O atraso de cada retry_count é aplicado no filtro SQL (coberto por
+        ix_log_status_retry), então só saem do banco as linhas prontas para
+        reenvio. Elas são processadas em lotes de retry_batch_size, com os
+        reenvios em paralelo e um commit por lote.
+        """
+        self._flush_logs()
         try:
+            now = datetime.utcnow()
+            last = len(self.retry_delays) - 1
+            due = or_(*(
+                and_(
+                    NotificationLog.retry_count == index if index < last
+                    else NotificationLog.retry_count >= index,
+                    NotificationLog.created_at <= now - timedelta(seconds=delay)
+                )
+                for index, delay in enumerate(self.retry_delays)
+            ))
+            
             with self.SessionLocal() as session:
-                # Buscar notificações falhas
-                failed = session.query(NotificationLog).filter(
-                    NotificationLog.status == 'failed',
-                    NotificationLog.retry_count < self.max_retries
-                ).all()
+                # Buscar IDs das notificações falhas prontas para reenvio
+                ids = [
+                    log_id for (log_id,) in session.query(NotificationLog.id).filter(
+                        NotificationLog.status == 'failed',
+                        NotificationLog.retry_count < self.max_retries,
+                        due
+                    )
+                ]
                 
-                for log in failed:
-                    # Calcular delay
-                    delay_index = min(log.retry_count, len(self.retry_delays) - 1)
-                    delay = self.retry_delays[delay_index]
+                semaphore = asyncio.Semaphore(self.max_concurrent_sends)
+                
+                async def retry(log: NotificationLog):
+                    # Reconstruir evento
+                    event = NotificationEvent(
+                        type=_TYPE_BY_VALUE[log.type],
+                        title=log.title,
+                        message=log.message,
+                        metadata=log.metadata,
+                        recipient=log.recipient,
+                        retry_count=log.retry_count + 1
+                    )
                     
-                    # Verificar se é hora de retentar
-                    retry_after = log.created_at + timedelta(seconds=delay)
-                    if datetime.utcnow() >= retry_after:
-                        # Reconstruir evento
-                        event = NotificationEvent(
-                            type=NotificationType(log.type),
-                            title=log.title,
-                            message=log.message,
-                            metadata=log.metadata,
-                            recipient=log.recipient,
-                            retry_count=log.retry_count + 1
-                        )
-                        
-                        # Reenviar apenas para o canal que falhou
-                        channel = NotificationChannel(log.channel)
-                        success = await self._send_to_channel(event, channel)
-                        
-                        if success:
-                            log.status = 'sent'
-                            log.sent_at = datetime.utcnow()
-                        else:
-                            log.retry_count += 1
-                        
-                        session.commit()
+                    # Reenviar apenas para o canal que falhou
+                    async with semaphore:
+                        success = await self._send_to_channel(event, _CHANNEL_BY_VALUE[log.channel])
+                    
+                    if success:
+                        log.status = 'sent'
+                        log.sent_at = datetime.utcnow()
+                    else:
+                        log.retry_count += 1
+                
+                for start in range(0, len(ids), self.retry_batch_size):
+                    logs = session.query(NotificationLog).filter(
+                        NotificationLog.id.in_(ids[start:start + self.retry_batch_size])
+                    ).all()
+                    
+                    results = await asyncio.gather(
+                        *(retry(log) for log in logs), return_exceptions=True
+                    )
+                    for log, result in zip(logs, results):
+                        if isinstance(result, BaseException):
+                            logger.error(f"Erro ao retentar notificação {log.id}: {result}")
+                    
+                    session.commit()
                         
         except Exception as e:
             logger.error(f"Erro ao retentar notificações: {e}")
     
     def get_notification_stats(self, days: int = 7) -> Dict:
         """Obter estatísticas de notificações"""
+        self._flush_logs()
         try:
             since = datetime.utcnow() - timedelta(days=days)
             
             with self.SessionLocal() as session:
-                logs = session.query(NotificationLog).filter(
+                # Agregação no banco: uma linha por (tipo, canal, status)
+                groups = session.query(
+                    NotificationLog.type,
+                    NotificationLog.channel,
+                    NotificationLog.status,
+                    func.count(NotificationLog.id)
+                ).filter(
                     NotificationLog.created_at >= since
+                ).group_by(
+                    NotificationLog.type,
+                    NotificationLog.channel,
+                    NotificationLog.status
                 ).all()
+            
+            stats = {
+                'total': 0,
+                'sent': 0,
+                'failed': 0,
+                'by_type': {},
+                'by_channel': {}
+            }
+            
+            for type_, channel, status, count in groups:
+                stats['total'] += count
+                if status in ('sent', 'failed'):
+                    stats[status] += count
                 
-                stats = {
-                    'total': len(logs),
-                    'sent': len([l for l in logs if l.status == 'sent']),
-                    'failed': len([l for l in logs if l.status == 'failed']),
-                    'by_type': {},
-                    'by_channel': {}
-                }
-                
-                # Agrupar por tipo
-                for log in logs:
-                    if log.type not in stats['by_type']:
-                        stats['by_type'][log.type] = {'sent': 0, 'failed': 0}
-                    
-                    if log.status == 'sent':
-                        stats['by_type'][log.type]['sent'] += 1
-                    else:
-                        stats['by_type'][log.type]['failed'] += 1
-                    
-                    # Agrupar por canal
-                    if log.channel not in stats['by_channel']:
-                        stats['by_channel'][log.channel] = {'sent': 0, 'failed': 0}
-                    
-                    if log.status == 'sent':
-                        stats['by_channel'][log.channel]['sent'] += 1
-                    else:
-                        stats['by_channel'][log.channel]['failed'] += 1
-                
-                return stats
+                # Por tipo e por canal (qualquer status diferente de sent conta como falha)
+                outcome = 'sent' if status == 'sent' else 'failed'
+                stats['by_type'].setdefault(type_, {'sent': 0, 'failed': 0})[outcome] += count
+                stats['by_channel'].setdefault(channel, {'sent': 0, 'failed': 0})[outcome] += count
+            
+            return stats
                 
         except Exception as e:
             logger.error(f"Erro ao obter estatísticas: {e}")
             return {}
+    
+    async def close(self):
+        """Enviar agrupados, gravar logs pendentes e liberar conexões dos provedores"""
+        await self._flush_coalesced()
+        
+        if self._log_flush_task is not None:
+            self._log_flush_task.cancel()
+            try:
+                await self._log_flush_task
+            except asyncio.CancelledError:
+                pass
+            self._log_flush_task = None
+        
+        self._flush_logs()
+        await self.providers[NotificationChannel.EMAIL].close()
+        await self.providers[NotificationChannel.TELEGRAM].close()
+        
+        closing = self._release_http_session()
+        if closing is not None:
+            await closing
 
 
 # Worker assíncrono
 async def notification_worker():
-    """Worker para processar notificações"""
+    """Worker para processar notificações
+    
+    Processo de longa duração: liga o agrupamento de rajadas (janela de
+    NOTIFICATION_COALESCE_WINDOW, 2s se não configurada).
+    """
     service = NotificationService()
+    service.coalesce_window_s = float(os.getenv('NOTIFICATION_COALESCE_WINDOW', '2.0'))
     
-    while True:
-        try:
-            # Processar agendadas
-            await service.process_scheduled_notifications()
-            
-            # Retentar falhas
-            await service.retry_failed_notifications()
-            
-            # Aguardar
-            await asyncio.sleep(60)  # Verificar a cada minuto
-            
-        except Exception as e:
-            logger.error(f"Erro no worker: {e}")
-            await asyncio.sleep(60)
+    try:
+        while True:
+            try:
+                # Processar agendadas
+                await service.process_scheduled_notifications()
+                
+                # Retentar falhas
+                await service.retry_failed_notifications()
+                
+                # Aguardar
+                await asyncio.sleep(60)  # Verificar a cada minuto
+                
+            except Exception as e:
+                logger.error(f"Erro no worker: {e}")
+                await asyncio.sleep(60)
+    finally:
+        await service.close()
+
+
+def run_notification_worker():
+    """Executar notification_worker como processo dedicado (com uvloop, se instalado)"""
+    if UVLOOP_AVAILABLE:
+        uvloop.install()
+    asyncio.run(notification_worker())
 
 
 if __name__ == "__main__":
@@ -881,6 +1563,8 @@ if __name__ == "__main__":
         # Estatísticas
         stats = service.get_notification_stats()
         print(f"Estatísticas: {stats}")
+        
+        await service.close()
     
     # Executar teste
     asyncio.run(test_notifications())
\ No newline at end of file
@@ -5,6 +5,7 @@ Testa o sistema completo de notificações e alertas
 """
 
 import asyncio
+import time
 import os
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -109,6 +110,8 @@ async def test_notifications():
     await asyncio.sleep(6)
     await service.process_scheduled_notifications()
     print("✅ Notificações agendadas processadas")
+    
+    await service.close()
 
 
 async def test_alert_engine():
@@ -222,6 +225,9 @@ async def test_alert_engine():
         print("\nPor regra:")
         for rule_id, count in stats['by_rule'].items():
             print(f"  {rule_id}: {count} alertas")
+    
+    # Gravar histórico/last_triggered pendentes e liberar conexões
+    await engine.close()
 
 
 async def test_integration():
@@ -249,7 +255,7 @@ async def test_integration():
             "autor": "Empresa ABC Ltda",
             "reu": "Empresa XYZ S.A."
         },
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": time.time_ns()
     }
     
     print(f"📄 Processo criado:")
@@ -288,6 +294,9 @@ async def test_integration():
     
     await notification_service.send_notification(risk_event)
     print("✅ Notificação de risco enviada")
+    
+    await alert_engine.close()
+    await notification_service.close()
 
 
 async def main():
@@ -0,0 +1,453 @@
+"""
+🧪 TESTES UNITÁRIOS - MOTOR DE ALERTAS
+Gravação em lote do histórico, métricas e last_triggered; condições REGEX
+janelas deslizantes de threshold/rate índice de regras por event_type
+e predicados gerados para as condições simples
+"""
+
+import pytest
+import asyncio
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+import sys
+
+# Adicionar diretório raiz ao path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("aiohttp")
+
+from sqlalchemy.exc import OperationalError
+
+from src.notifications.alert_rules import (
+    AlertCategory,
+    AlertCondition,
+    AlertEngine,
+    AlertHistory,
+    AlertMetrics,
+    AlertRule,
+    AlertRuleDB,
+    SlidingWindow,
+    _REGEX_CACHE,
+    _compilar_regex,
+    _gerar_predicado,
+    _memoizar_predicado,
+    create_alert_queue,
+    start_alert_processors
+)
+from src.notifications.notification_service import NotificationPriority
+
+
+def contar(engine: AlertEngine, modelo) -> int:
+    """Linhas gravadas no banco para o modelo"""
+    with engine.SessionLocal() as session:
+        return session.query(modelo).count()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Motor com banco SQLite temporário e flush periódico fora do caminho"""
+    engine = AlertEngine(f"sqlite:///{tmp_path / 'alerts.db'}")
+    engine.flush_interval_s = 3600
+    engine.add_rule(AlertRule(
+        id="teste_alto_valor",
+        name="Processo de alto valor",
+        description="Alerta para processos acima de R$ 500.000",
+        category=AlertCategory.BUSINESS,
+        conditions=[
+            {"field": "tipo", "condition": AlertCondition.EQUALS.value, "value": "novo_processo"},
+            {"field": "valor", "condition": AlertCondition.GREATER_THAN.value, "value": 500000}
+        ],
+        actions=[{"type": "notification", "channels": ["database"]}],
+        priority=NotificationPriority.HIGH,
+        cooldown_minutes=5
+    ))
+    return engine
+
+
+EVENTO_ALTO_VALOR = {"tipo": "novo_processo", "valor": 750000, "numero": "1234567-89.2024.8.26.0100"}
+
+
+def regra(rule_id: str, *conditions: dict) -> AlertRule:
+    """Regra de teste sem ações e sem cooldown"""
+    return AlertRule(
+        id=rule_id,
+        name=rule_id,
+        description="Regra de teste",
+        category=AlertCategory.SYSTEM,
+        conditions=list(conditions),
+        cooldown_minutes=0
+    )
+
+
+def condicao(field: str, tipo: AlertCondition, value, **kwargs) -> dict:
+    """Condição no formato gravado no banco"""
+    return {"field": field, "condition": tipo.value, "value": value, **kwargs}
+
+
+@pytest.mark.asyncio
+class TestHistoricoEmLote:
+    """Testes do histórico de alertas acumulado em memória"""
+
+    async def test_historico_fica_no_buffer(self, engine):
+        """Alerta disparado entra no buffer, sem escrita imediata"""
+        disparados = await engine.process_event(EVENTO_ALTO_VALOR)
+
+        assert disparados == ["teste_alto_valor"]
+        assert len(engine._history_buffer) == 1
+        assert contar(engine, AlertHistory) == 0
+        await engine.close()
+
+    async def test_estatisticas_incluem_buffer(self, engine):
+        """get_alert_stats grava o histórico pendente antes de consultar"""
+        await engine.process_event(EVENTO_ALTO_VALOR)
+
+        stats = engine.get_alert_stats(days=1)
+
+        assert stats['total_alerts'] == 1
+        assert stats['by_rule'] == {"teste_alto_valor": 1}
+        await engine.close()
+
+    async def test_close_grava_pendentes(self, engine):
+        """close() grava histórico, métricas e last_triggered pendentes"""
+        await engine.process_event(EVENTO_ALTO_VALOR)
+        engine.add_metric("cpu_usage", 55.0)
+
+        await engine.close()
+
+        assert contar(engine, AlertHistory) == 1
+        assert contar(engine, AlertMetrics) == 1
+        with engine.SessionLocal() as session:
+            regra = session.get(AlertRuleDB, "teste_alto_valor")
+            assert regra.last_triggered is not None
+
+    async def test_lote_cheio_gravado_imediatamente(self, engine):
+        """Buffer que atinge flush_batch_size é gravado sem esperar o intervalo"""
+        engine.flush_batch_size = 3
+        for i in range(3):
+            engine.add_metric("cpu_usage", 40.0 + i)
+
+        assert not engine._metric_buffer
+        assert contar(engine, AlertMetrics) == 3
+        await engine.close()
+
+    async def test_erro_no_banco_mantem_pendentes(self, engine, monkeypatch):
+        """Falha no commit não descarta histórico, métricas nem last_triggered"""
+        await engine.process_event(EVENTO_ALTO_VALOR)
+        engine.add_metric("cpu_usage", 55.0)
+
+        abrir_sessao = engine.SessionLocal
+
+        def sessao_com_falha():
+            session = abrir_sessao()
+            session.commit = MagicMock(
+                side_effect=OperationalError("COMMIT", {}, Exception("banco indisponível"))
+            )
+            return session
+
+        monkeypatch.setattr(engine, 'SessionLocal', sessao_com_falha)
+        engine._flush_pending()
+
+        assert len(engine._history_buffer) == 1
+        assert len(engine._metric_buffer) == 1
+        assert len(engine._pending_trigger_updates) == 1
+
+        monkeypatch.setattr(engine, 'SessionLocal', abrir_sessao)
+        engine._flush_pending()
+
+        assert not engine._history_buffer
+        assert not engine._metric_buffer
+        assert not engine._pending_trigger_updates
+        assert contar(engine, AlertHistory) == 1
+        assert contar(engine, AlertMetrics) == 1
+        with engine.SessionLocal() as session:
+            assert session.get(AlertRuleDB, "teste_alto_valor").last_triggered is not None
+        await engine.close()
+
+
+@pytest.mark.asyncio
+class TestProcessadores:
+    """Testes dos workers de alert_processor"""
+
+    async def test_quantidade_padrao_fixa(self, engine):
+        """Sem workers informado, sobem 4 tasks (independente dos núcleos)"""
+        tasks = start_alert_processors(engine, create_alert_queue())
+
+        assert len(tasks) == 4
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await engine.close()
+
+
+@pytest.mark.asyncio
+class TestCondicaoRegex:
+    """Testes das condições REGEX com padrões compilados em cache"""
+
+    async def test_padrao_compilado_uma_vez(self, engine):
+        """O mesmo padrão devolve sempre o mesmo objeto compilado"""
+        padrao = r"\d{7}-\d{2}\.\d{4}"
+
+        compilado = _compilar_regex(padrao)
+
+        assert _compilar_regex(padrao) is compilado
+        assert _REGEX_CACHE[padrao] is compilado
+        spec = engine._condicao_simples(condicao("numero", AlertCondition.REGEX, padrao))
+        assert spec[2] is compilado
+        await engine.close()
+
+    async def test_regex_avaliado_no_evento(self, engine):
+        """Regra REGEX dispara só quando o início do valor casa com o padrão"""
+        engine.add_rule(regra(
+            "teste_regex", condicao("numero", AlertCondition.REGEX, r"\d{7}-\d{2}\.2024")
+        ))
+
+        assert "teste_regex" in await engine.process_event({"numero": "1234567-89.2024.8.26.0100"})
+        assert "teste_regex" not in await engine.process_event({"numero": "1234567-89.2023.8.26.0100"})
+        assert "teste_regex" not in await engine.process_event({"numero": "processo 1234567-89.2024"})
+        await engine.close()
+
+    async def test_padrao_invalido_nao_dispara(self, engine):
+        """Padrão inválido é registrado como erro e a regra nunca dispara"""
+        engine.add_rule(regra("teste_regex_invalido", condicao("numero", AlertCondition.REGEX, "[")))
+
+        assert "teste_regex_invalido" not in await engine.process_event({"numero": "["})
+        await engine.close()
+
+
+class TestSlidingWindow:
+    """Testes da janela deslizante com soma incremental"""
+
+    def test_evict_descarta_entradas_antigas(self):
+        """Entradas mais antigas que a janela saem da contagem e da soma"""
+        janela = SlidingWindow(30)
+        janela.add(0.0, 5.0)
+        janela.add(10.0, 7.0)
+
+        janela.evict(35.0)
+
+        assert len(janela) == 1
+        assert janela.total == 7.0
+
+        janela.evict(100.0)
+
+        assert len(janela) == 0
+        assert janela.total == 0.0
+
+
+@pytest.mark.asyncio
+class TestJanelasThresholdRate:
+    """Testes das condições threshold/rate avaliadas em janelas na memória"""
+
+    async def test_threshold_pela_media(self, engine):
+        """Threshold compara a média das métricas da janela"""
+        engine.add_rule(regra(
+            "teste_cpu", condicao("cpu_usage", AlertCondition.THRESHOLD_EXCEEDED, 80, window_minutes=5)
+        ))
+
+        engine.add_metric("cpu_usage", 70.0)
+        assert "teste_cpu" not in await engine.process_event({})
+
+        engine.add_metric("cpu_usage", 95.0)
+        assert "teste_cpu" in await engine.process_event({})
+        await engine.close()
+
+    async def test_rate_pela_variacao(self, engine):
+        """Rate compara a variação entre a primeira e a última métrica"""
+        engine.add_rule(regra(
+            "teste_latencia", condicao("latencia", AlertCondition.RATE_EXCEEDED, 0.5, window_minutes=5)
+        ))
+
+        engine.add_metric("latencia", 100.0)
+        engine.add_metric("latencia", 120.0)
+        assert "teste_latencia" not in await engine.process_event({})
+
+        engine.add_metric("latencia", 200.0)
+        assert "teste_latencia" in await engine.process_event({})
+        await engine.close()
+
+    async def test_janela_carregada_do_banco(self, engine, tmp_path):
+        """Janela criada depois carrega as métricas já gravadas do período"""
+        engine.add_metric("cpu_usage", 95.0)
+        engine.add_metric("cpu_usage", 91.0)
+        await engine.close()
+
+        outro = AlertEngine(f"sqlite:///{tmp_path / 'alerts.db'}")
+        outro.flush_interval_s = 3600
+        outro.add_rule(regra(
+            "teste_cpu", condicao("cpu_usage", AlertCondition.THRESHOLD_EXCEEDED, 90, window_minutes=5)
+        ))
+
+        assert len(outro._metric_windows["cpu_usage"][300]) == 2
+        assert "teste_cpu" in await outro.process_event({})
+        await outro.close()
+
+
+@pytest.mark.asyncio
+class TestPredicadosDeJanela:
+    """Testes dos predicados threshold/rate ligados diretamente às janelas"""
+
+    async def test_regras_compartilham_janela(self, engine):
+        """Regras com o mesmo campo e período usam uma única janela"""
+        for rule_id in ("teste_cpu_a", "teste_cpu_b"):
+            engine.add_rule(regra(
+                rule_id, condicao("cpu_usage", AlertCondition.THRESHOLD_EXCEEDED, 80, window_minutes=5)
+            ))
+
+        assert list(engine._metric_windows["cpu_usage"]) == [300]
+
+        engine.add_metric("cpu_usage", 99.0)
+
+        assert {"teste_cpu_a", "teste_cpu_b"} <= set(await engine.process_event({}))
+        await engine.close()
+
+    async def test_predicado_descarta_entradas_vencidas(self, engine):
+        """Ao avaliar, o predicado tira da janela as métricas fora do período"""
+        engine.add_rule(regra(
+            "teste_cpu", condicao("cpu_usage", AlertCondition.THRESHOLD_EXCEEDED, 80, window_minutes=5)
+        ))
+        janela = engine._metric_windows["cpu_usage"][300]
+        janela.add(time.monotonic() - 400, 99.0)
+
+        assert "teste_cpu" not in await engine.process_event({})
+        assert len(janela) == 0
+        await engine.close()
+
+
+@pytest.mark.asyncio
+class TestIndicePorEventType:
+    """Testes do índice de regras pelo event_type exigido"""
+
+    @pytest.fixture
+    def regras(self, engine):
+        """Regras com EQUALS, IN e sem discriminador de event_type"""
+        engine.add_rule(regra("teste_login", condicao("event_type", AlertCondition.EQUALS, "login_failed")))
+        engine.add_rule(regra(
+            "teste_processo", condicao("event_type", AlertCondition.IN, ["processo_criado", "processo_arquivado"])
+        ))
+        engine.add_rule(regra("teste_qualquer", condicao("valor", AlertCondition.GREATER_THAN, 10)))
+        return engine
+
+    @staticmethod
+    def candidatas(engine, evento) -> set:
+        """IDs das regras de teste candidatas para o evento"""
+        ids = {"teste_login", "teste_processo", "teste_qualquer"}
+        return {rule.id for rule in engine._candidate_rules(evento) if rule.id in ids}
+
+    async def test_candidatas_por_event_type(self, regras):
+        """Cada event_type recebe as regras dele mais as sem discriminador"""
+        assert self.candidatas(regras, {"event_type": "login_failed"}) == {"teste_login", "teste_qualquer"}
+        assert self.candidatas(regras, {"event_type": "processo_arquivado"}) == {"teste_processo", "teste_qualquer"}
+        assert self.candidatas(regras, {"event_type": "outro"}) == {"teste_qualquer"}
+        assert self.candidatas(regras, {}) == {"teste_qualquer"}
+        await regras.close()
+
+    async def test_event_type_nao_hashable(self, regras):
+        """event_type lista não quebra o índice: só as regras sem discriminador"""
+        assert self.candidatas(regras, {"event_type": ["login_failed"]}) == {"teste_qualquer"}
+        await regras.close()
+
+    async def test_regra_indexada_dispara(self, regras):
+        """O índice não muda o resultado da avaliação"""
+        disparados = await regras.process_event({"event_type": "login_failed", "valor": 50})
+
+        assert {"teste_login", "teste_qualquer"} <= set(disparados)
+        assert "teste_processo" not in disparados
+        await regras.close()
+
+    async def test_candidatas_pre_montadas(self, regras):
+        """Cada event_type devolve a mesma tupla, montada na indexação"""
+        primeira = regras._candidate_rules({"event_type": "login_failed"})
+
+        assert isinstance(primeira, tuple)
+        assert regras._candidate_rules({"event_type": "login_failed"}) is primeira
+        assert primeira[-len(regras._rules_unindexed):] == regras._rules_unindexed
+        await regras.close()
+
+    async def test_indice_refeito_ao_alterar_regras(self, regras):
+        """Regra nova entra no índice e regra desativada sai dele"""
+        regras.add_rule(regra("teste_login_2", condicao("event_type", AlertCondition.EQUALS, "login_failed")))
+
+        ids = {rule.id for rule in regras._candidate_rules({"event_type": "login_failed"})}
+        assert {"teste_login", "teste_login_2"} <= ids
+
+        regras.update_rule("teste_login", {"enabled": False})
+
+        ids = {rule.id for rule in regras._candidate_rules({"event_type": "login_failed"})}
+        assert "teste_login" not in ids
+        assert "teste_login_2" in ids
+        await regras.close()
+
+
+class TestPredicadosGerados:
+    """Testes da função gerada para as condições simples de uma regra"""
+
+    @pytest.fixture(autouse=True)
+    def preparar(self, engine):
+        """Motor usado para converter as condições"""
+        self.engine = engine
+        yield
+        asyncio.run(engine.close())
+
+    def simples(self, *conditions: dict) -> list:
+        """Condições no formato (código, caminho, valor) usado pelo gerador"""
+        return [self.engine._condicao_simples(condition) for condition in conditions]
+
+    def test_condicoes_em_sequencia(self):
+        """Todas as condições precisam valer, inclusive em campos aninhados"""
+        predicado = _gerar_predicado("teste", self.simples(
+            condicao("event_type", AlertCondition.EQUALS, "processo_criado"),
+            condicao("processo.valor", AlertCondition.GREATER_THAN, "1000"),
+            condicao("processo.tribunal", AlertCondition.IN, ["TJSP", "TJRJ"]),
+            condicao("processo.classe", AlertCondition.NOT_CONTAINS, "Arquivado")
+        ))
+        evento = {
+            "event_type": "processo_criado",
+            "processo": {"valor": 2500.0, "tribunal": "TJSP", "classe": "Indenização"}
+        }
+
+        assert predicado(evento) is True
+        assert predicado(dict(evento, event_type="outro")) is False
+        assert predicado({"event_type": "processo_criado", "processo": {"valor": 10}}) is False
+        assert predicado({"event_type": "processo_criado"}) is False
+
+    def test_erro_de_conversao_vira_falso(self):
+        """Valor não numérico em GREATER_THAN não propaga exceção"""
+        predicado = _gerar_predicado("teste", self.simples(
+            condicao("valor", AlertCondition.GREATER_THAN, 10)
+        ))
+
+        assert predicado({"valor": "abc"}) is False
+        assert predicado({"valor": "11"}) is True
+
+    def test_valores_fora_do_codigo_gerado(self):
+        """Valor da regra é constante do namespace, nunca código"""
+        valor = "x') or True or ('"
+        predicado = _gerar_predicado("teste", self.simples(
+            condicao("nome", AlertCondition.EQUALS, valor)
+        ))
+
+        assert predicado({"nome": "outro"}) is False
+        assert predicado({"nome": valor}) is True
+        assert predicado.__code__.co_filename == "<alert_rule:teste>"
+
+    def test_cache_distingue_tipos(self):
+        """1 e True têm o mesmo hash, mas resultados próprios no cache"""
+        predicado = _memoizar_predicado("teste", self.simples(
+            condicao("flag", AlertCondition.REGEX, "^1$")
+        ))
+
+        assert predicado({"flag": 1}) is True
+        assert predicado({"flag": True}) is False
+        assert predicado({"flag": 1}) is True
+
+    def test_cache_com_valor_nao_hashable(self):
+        """Valor lista é avaliado sem cache"""
+        predicado = _memoizar_predicado("teste", self.simples(
+            condicao("tags", AlertCondition.REGEX, r"\[1")
+        ))
+
+        assert predicado({"tags": [1, 2]}) is True
+        assert predicado({"tags": [2]}) is False
@@ -0,0 +1,194 @@
+"""
+🧪 TESTES UNITÁRIOS - GERADOR DE MINUTAS
+Extração de campos, classificação das petições, templates e caches
+"""
+
+import pytest
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import sys
+
+# Adicionar diretório raiz ao path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.minutas.gerador_minutas import GeradorMinutas, PeticaoAnalise, TipoAcao
+
+
+PETICAO_DANO_MORAL = """
+EXCELENTÍSSIMO SENHOR DOUTOR JUIZ DE DIREITO.
+Requerente: Maria Silva, brasileira, portadora do RG e CPF, vem propor ação
+contra Banco Alfa S.A. em razão da negativação indevida, que causou constrangimento
+e abalo à autora, conforme art. 186 do Código Civil. Súmula 385 do STJ.
+Dos pedidos: a) indenização por dano moral; b) exclusão da negativação.
+Valor da causa: R$ 15.000,00.
+"""
+
+
+class TestExtracaoCampos:
+    """Testes da extração de partes e fundamentos"""
+
+    def setup_method(self):
+        """Configura teste"""
+        self.gerador = GeradorMinutas(use_ai=False)
+
+    def test_partes_por_prioridade(self):
+        """Autor e réu vêm do padrão de maior prioridade"""
+        assert self.gerador._extrair_autor(PETICAO_DANO_MORAL) == "Maria Silva"
+        assert self.gerador._extrair_reu(PETICAO_DANO_MORAL).startswith("Banco Alfa")
+        assert self.gerador._extrair_autor("sem partes") == "AUTOR NÃO IDENTIFICADO"
+
+    def test_fundamentos_limitados_por_tipo(self):
+        """Até 5 leis, 5 códigos e 3 súmulas, na ordem do findall de cada tipo"""
+        texto = " ".join(
+            [f"Art. {i} do Código Civil." for i in range(1, 8)]
+            + [f"Súmula {i} do STJ." for i in range(1, 6)]
+        )
+
+        fundamentos = self.gerador._extrair_fundamentos(texto)
+
+        leis = re.findall(r'(?:art\.?\s*\d+|artigo\s+\d+)[^.]*(?:da|do)\s+[^.]+', texto, re.IGNORECASE)
+        sumulas = re.findall(r'súmula\s+\d+[^.]*', texto, re.IGNORECASE)
+        assert fundamentos == (leis[:5] + sumulas[:3])[:10]
+        assert len(fundamentos) == 8
+
+
+class TestClassificacao:
+    """Testes da classificação do tipo de ação"""
+
+    # Dano moral aparece primeiro, mas cobrança tem mais palavras-chave no total
+    TEXTO_MISTO = (
+        "dano moral, indenização e negativação no início; depois cobrança do débito, "
+        "pagamento do valor devido, inadimplemento da prestação"
+    )
+
+    def setup_method(self):
+        """Configura teste"""
+        self.gerador = GeradorMinutas(use_ai=False)
+
+    def test_contagem_completa(self):
+        """Vence o tipo com mais palavras-chave no texto inteiro"""
+        assert self.gerador._classificar_acao(self.TEXTO_MISTO) is TipoAcao.COBRANCA
+
+    def test_mesmo_resultado_sem_automato(self):
+        """Com ou sem pyahocorasick, a classificação é a mesma"""
+        if self.gerador._acao_automaton is None:
+            pytest.skip("pyahocorasick não instalado")
+
+        textos = [self.TEXTO_MISTO, PETICAO_DANO_MORAL.lower(), "revisão de juros abusivos", "nada"]
+        com_automato = [self.gerador._classificar_acao(texto) for texto in textos]
+        self.gerador._acao_automaton = None
+        sem_automato = [self.gerador._classificar_acao(texto) for texto in textos]
+
+        assert com_automato == sem_automato
+
+    def test_sem_palavras_chave(self):
+        """Sem palavras-chave, a ação é ordinária"""
+        assert self.gerador._classificar_acao("texto qualquer") is TipoAcao.ORDINARIA
+
+    def test_dano_moral_aplica_tabelas_especificas(self):
+        """Petição de dano moral recebe requisitos, provas e recomendações próprios"""
+        analise = self.gerador.analisar_peticao(PETICAO_DANO_MORAL)
+
+        assert analise.tipo_acao_enum is TipoAcao.DANO_MORAL
+        assert analise.tipo_acao == TipoAcao.DANO_MORAL.value
+        assert analise.requisitos_preenchidos["prova_dano"] is True
+        assert "Comprovante de negativação/protesto" in analise.provas_necessarias
+        assert "💰 Considerar valor adequado para dano moral" in analise.recomendacoes
+
+    def test_enum_derivado_do_rotulo(self):
+        """PeticaoAnalise montada à mão deriva o enum do rótulo"""
+        analise = PeticaoAnalise(
+            autor="A", reu="B", tipo_acao="ação de cobrança", pedidos=[], fundamentos=[],
+            valor_causa=None, competencia="", requisitos_preenchidos={},
+            provas_necessarias=[], recomendacoes=[]
+        )
+
+        assert analise.tipo_acao_enum is TipoAcao.COBRANCA
+
+
+class TestTemplates:
+    """Testes de preenchimento dos templates de minuta"""
+
+    def setup_method(self):
+        """Configura teste"""
+        self.gerador = GeradorMinutas(use_ai=False)
+        self.analise = self.gerador.analisar_peticao(PETICAO_DANO_MORAL)
+
+    @pytest.mark.parametrize("tipo_minuta", ["sentenca_procedencia", "despacho_diligencias"])
+    def test_campos_ausentes_ficam_vazios(self, tipo_minuta):
+        """Templates com campos não preenchidos são gerados sem KeyError"""
+        minuta = self.gerador.gerar_minuta(self.analise, tipo_minuta)
+
+        assert "Processo: 0000000-00.0000.0.00.0000" in minuta.conteudo
+        assert "{" not in minuta.conteudo
+
+    def test_template_adicionado_depois(self):
+        """Template incluído após a construção é processado no primeiro uso"""
+        self.gerador.templates["teste"] = "Autor: {autor}; campo: [{inexistente}]"
+
+        minuta = self.gerador.gerar_minuta(self.analise, "teste")
+
+        assert minuta.conteudo == "Autor: Maria Silva; campo: []"
+
+
+class TestCaches:
+    """Testes dos caches de análises e minutas"""
+
+    def setup_method(self):
+        """Configura teste"""
+        self.gerador = GeradorMinutas(use_ai=False)
+
+    def test_analise_devolve_copia(self):
+        """Alterar uma análise devolvida não afeta o cache"""
+        primeira = self.gerador.analisar_peticao(PETICAO_DANO_MORAL)
+        primeira.autor = "Outro Nome"
+        primeira.pedidos.append("pedido extra")
+
+        segunda = self.gerador.analisar_peticao(PETICAO_DANO_MORAL)
+
+        assert segunda is not primeira
+        assert segunda.autor == "Maria Silva"
+        assert "pedido extra" not in segunda.pedidos
+
+    def test_minuta_acompanha_analise_alterada(self):
+        """Análise alterada depois de gerar a minuta não recebe a minuta antiga"""
+        analise = self.gerador.analisar_peticao(PETICAO_DANO_MORAL)
+        original = self.gerador.gerar_minuta(analise)
+        original.observacoes.append("observação local")
+
+        repetida = self.gerador.gerar_minuta(analise)
+        assert repetida.conteudo == original.conteudo
+        assert "observação local" not in repetida.observacoes
+
+        analise.autor = "Joana Souza"
+        alterada = self.gerador.gerar_minuta(analise)
+        assert "Joana Souza" in alterada.conteudo
+
+    def test_minuta_em_cache_com_data_atual(self):
+        """Acerto no cache traz a data de geração da chamada"""
+        analise = self.gerador.analisar_peticao(PETICAO_DANO_MORAL)
+        primeira = self.gerador.gerar_minuta(analise)
+        time.sleep(0.01)
+
+        segunda = self.gerador.gerar_minuta(analise)
+
+        assert segunda.conteudo == primeira.conteudo
+        assert segunda.data_geracao > primeira.data_geracao
+
+    def test_acesso_concorrente(self):
+        """Várias threads usando os caches ao mesmo tempo"""
+        self.gerador._CACHE_MAX = 4
+        textos = [PETICAO_DANO_MORAL.replace("15.000", str(i)) for i in range(16)]
+
+        def analisar(texto):
+            analise = self.gerador.analisar_peticao(texto)
+            return self.gerador.gerar_minuta(analise).conteudo
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            conteudos = list(pool.map(analisar, textos * 8))
+
+        assert all("Maria Silva" in conteudo for conteudo in conteudos)
+        assert len(self.gerador._cache_analises) <= 4
+        assert len(self.gerador._cache_minutas) <= 4
@@ -0,0 +1,167 @@
+"""
+🧪 TESTES UNITÁRIOS - CONFIGURAÇÃO DE LOGGING
+Fila de logs em memória e formatação JSON
+"""
+
+import pytest
+import json
+import logging
+import queue
+from pathlib import Path
+import sys
+
+# Adicionar diretório raiz ao path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.monitoring.logging_config import (
+    JSONFormatter,
+    LocalQueueHandler,
+    TaskLogger,
+    _resolve_level,
+    log_with_context,
+    log_with_context_int
+)
+
+
+@pytest.fixture
+def fila_logger():
+    """Logger isolado que enfileira os records num LocalQueueHandler"""
+    fila = queue.Queue()
+    logger = logging.getLogger('tests.unit.logging_config')
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    handler = LocalQueueHandler(fila)
+    logger.addHandler(handler)
+    yield logger, fila
+    logger.removeHandler(handler)
+
+
+class Coletor(logging.Handler):
+    """Handler que guarda os records recebidos"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def coletor():
+    """Logger isolado com um Coletor"""
+    logger = logging.getLogger('tests.unit.logging_config.coletor')
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    handler = Coletor()
+    logger.addHandler(handler)
+    yield logger, handler.records
+    logger.removeHandler(handler)
+
+
+class TestNiveis:
+    """Testes da resolução dos nomes de nível"""
+
+    @pytest.mark.parametrize("nome, nivel", [
+        ("INFO", logging.INFO),
+        ("debug", logging.DEBUG),
+        ("WARN", logging.WARNING),
+        ("Warning", logging.WARNING),
+        ("FATAL", logging.CRITICAL),
+        ("critical", logging.CRITICAL),
+    ])
+    def test_nomes_aceitos(self, nome, nivel):
+        """Nomes comuns e aliases do logging"""
+        assert _resolve_level(nome) == nivel
+
+    def test_nome_desconhecido(self):
+        """Nome que o logging não conhece gera erro em vez de virar INFO"""
+        with pytest.raises(ValueError):
+            _resolve_level("VERBOSE")
+
+    def test_log_with_context_alias(self, coletor):
+        """log_with_context com 'WARN' registra em WARNING"""
+        logger, records = coletor
+
+        log_with_context(logger, 'WARN', "disco em %d%%", 91, disco='/dev/sda1')
+
+        assert records[0].levelno == logging.WARNING
+        assert records[0].getMessage() == "disco em 91%"
+        assert records[0].extra_fields == {'disco': '/dev/sda1'}
+
+
+class TestStacklevel:
+    """Testes da origem (função/linha) atribuída aos records"""
+
+    def test_chamada_direta(self, coletor):
+        """log_with_context_int aponta para quem o chamou"""
+        logger, records = coletor
+
+        log_with_context_int(logger, logging.INFO, "direto")
+
+        assert records[0].funcName == 'test_chamada_direta'
+
+    def test_wrapper(self, coletor):
+        """TaskLogger aponta para quem chamou o wrapper, não para o wrapper"""
+        logger, records = coletor
+        task_logger = TaskLogger(logger.name)
+
+        task_logger.log_task_start('tarefa', 'id-1')
+
+        assert records[0].funcName == 'test_wrapper'
+        assert records[0].extra_fields['task_id'] == 'id-1'
+
+
+class TestLocalQueueHandler:
+    """Testes da preparação dos records ao enfileirar"""
+
+    def test_mensagem_resolvida_ao_enfileirar(self, fila_logger):
+        """Argumentos mutáveis alterados depois do log não mudam a mensagem"""
+        logger, fila = fila_logger
+        dados = [1]
+
+        logger.info("data=%s", dados)
+        dados.append(2)
+
+        record = fila.get_nowait()
+        assert record.getMessage() == "data=[1]"
+        assert record.args is None
+
+    def test_excecao_formatada_ao_enfileirar(self, fila_logger):
+        """O traceback vira texto e a exceção (com os frames) não fica na fila"""
+        logger, fila = fila_logger
+        try:
+            raise ValueError("falhou")
+        except ValueError:
+            logger.exception("erro ao processar")
+
+        record = fila.get_nowait()
+        assert record.exc_info is None
+        assert "ValueError: falhou" in record.exc_text
+
+        dados = json.loads(JSONFormatter().format(record))
+        assert dados['message'] == "erro ao processar"
+        assert "ValueError: falhou" in dados['exception']
+
+    def test_campos_extras_preservados(self, fila_logger):
+        """Campos de contexto seguem no record para o JSONFormatter"""
+        logger, fila = fila_logger
+
+        logger.info("evento %s", "x", extra={'extra_fields': {'request_id': 'abc'}})
+
+        dados = json.loads(JSONFormatter().format(fila.get_nowait()))
+        assert dados['message'] == "evento x"
+        assert dados['request_id'] == 'abc'
+
+    def test_record_original_intacto(self, fila_logger):
+        """Outros handlers do logger recebem o record original"""
+        logger, fila = fila_logger
+        coletor = Coletor()
+        logger.addHandler(coletor)
+        try:
+            logger.info("valor %d", 42)
+        finally:
+            logger.removeHandler(coletor)
+
+        assert coletor.records[0].args == (42,)
+        assert fila.get_nowait().getMessage() == "valor 42"
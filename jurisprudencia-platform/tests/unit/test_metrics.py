@@ -0,0 +1,62 @@
+"""
+🧪 TESTES UNITÁRIOS - MÉTRICAS
+Decorator de rastreamento do processamento de PDFs
+"""
+
+import pytest
+from pathlib import Path
+import sys
+
+# Adicionar diretório raiz ao path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+pytest.importorskip("prometheus_client")
+
+from src.monitoring.metrics import pdf_size_bytes, track_pdf_processing
+
+
+def soma_observada() -> float:
+    """Soma dos tamanhos já registrados no histograma pdf_size_bytes"""
+    return next(
+        sample.value
+        for metric in pdf_size_bytes.collect()
+        for sample in metric.samples
+        if sample.name.endswith('_sum')
+    )
+
+
+class TestTrackPdfProcessing:
+    """Testes do decorator track_pdf_processing"""
+
+    def test_pdf_size_repassado(self):
+        """pdf_size chega à função decorada e é registrado"""
+        @track_pdf_processing
+        def processar(conteudo, pdf_size=None):
+            return pdf_size
+
+        antes = soma_observada()
+
+        assert processar(b"%PDF", pdf_size=1234) == 1234
+        assert soma_observada() - antes == 1234
+
+    def test_tamanho_pelo_arquivo(self, tmp_path):
+        """Sem pdf_size, o tamanho vem do arquivo em pdf_path"""
+        pdf = tmp_path / "doc.pdf"
+        pdf.write_bytes(b"x" * 100)
+
+        @track_pdf_processing
+        def processar(pdf_path):
+            return pdf_path
+
+        antes = soma_observada()
+
+        assert processar(pdf_path=pdf) == pdf
+        assert soma_observada() - antes == 100
+
+    def test_funcao_sem_pdf_size(self):
+        """Funções que não recebem pdf_size continuam funcionando"""
+        @track_pdf_processing
+        def processar(conteudo):
+            return len(conteudo)
+
+        assert processar(b"abc") == 3
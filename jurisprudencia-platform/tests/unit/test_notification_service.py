@@ -0,0 +1,326 @@
+"""
+🧪 TESTES UNITÁRIOS - SERVIÇO DE NOTIFICAÇÕES
+Serialização do webhook, agrupamento Slack/Discord, conexões por event loop
+e gravação em lote dos logs
+"""
+
+import pytest
+import asyncio
+import json
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+import sys
+
+# Adicionar diretório raiz ao path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("aiohttp")
+
+from src.notifications.notification_service import (
+    EmailProvider,
+    NotificationChannel,
+    NotificationEvent,
+    NotificationLog,
+    NotificationPriority,
+    NotificationService,
+    NotificationType,
+    _serialize_event
+)
+
+
+def criar_evento(titulo: str = "Novo processo", **kwargs) -> NotificationEvent:
+    """Evento INFO de teste"""
+    return NotificationEvent(
+        type=kwargs.pop('type', NotificationType.INFO),
+        title=titulo,
+        message=f"Mensagem de {titulo}",
+        **kwargs
+    )
+
+
+def contar_logs(service: NotificationService, **filtros) -> int:
+    """Linhas de NotificationLog gravadas no banco"""
+    with service.SessionLocal() as session:
+        return session.query(NotificationLog).filter_by(**filtros).count()
+
+
+def criar_servico(tmp_path, monkeypatch) -> NotificationService:
+    """Serviço com banco SQLite temporário e Slack/Discord simulados"""
+    service = NotificationService(f"sqlite:///{tmp_path / 'notifications.db'}")
+    monkeypatch.setattr(service, '_get_http_session', lambda: None)
+    for channel in (NotificationChannel.SLACK, NotificationChannel.DISCORD):
+        monkeypatch.setattr(service.providers[channel], 'send_async', AsyncMock(return_value=True))
+    return service
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """Serviço com agrupamento ligado (janela longa: só sai no close ou lote cheio)"""
+    monkeypatch.setenv('NOTIFICATION_COALESCE_WINDOW', '60')
+    return criar_servico(tmp_path, monkeypatch)
+
+
+class TestSerializacaoWebhook:
+    """Testes do corpo JSON do webhook genérico"""
+
+    def test_enums_e_datas_serializados(self):
+        """Enums viram valores e datas viram ISO 8601"""
+        agendado = datetime(2024, 5, 10, 14, 30)
+        evento = criar_evento(
+            priority=NotificationPriority.HIGH,
+            channels=[NotificationChannel.WEBHOOK, NotificationChannel.DATABASE],
+            metadata={'processo': '1234567-89.2024.8.26.0100', 'prazo': datetime(2024, 6, 1)},
+            scheduled_at=agendado
+        )
+
+        dados = json.loads(_serialize_event(evento))
+
+        assert dados['type'] == 'info'
+        assert dados['priority'] == 3
+        assert dados['channels'] == ['webhook', 'database']
+        assert dados['scheduled_at'] == agendado.isoformat()
+        assert dados['metadata']['processo'] == '1234567-89.2024.8.26.0100'
+        assert dados['metadata']['prazo'].startswith('2024-06-01')
+
+    def test_campos_opcionais_vazios(self):
+        """Evento sem canais, metadata e agendamento"""
+        dados = json.loads(_serialize_event(criar_evento()))
+
+        assert dados['channels'] == []
+        assert dados['metadata'] is None
+        assert dados['scheduled_at'] is None
+
+
+@pytest.mark.asyncio
+class TestAgrupamento:
+    """Testes do agrupamento de rajadas em Slack/Discord"""
+
+    async def test_desativado_por_padrao(self, tmp_path, monkeypatch):
+        """Sem configuração, cada evento é enviado na hora"""
+        monkeypatch.delenv('NOTIFICATION_COALESCE_WINDOW', raising=False)
+        service = criar_servico(tmp_path, monkeypatch)
+        slack = service.providers[NotificationChannel.SLACK]
+
+        assert service.coalesce_window_s == 0
+        assert await service._dispatch_channel("evento", criar_evento(), NotificationChannel.SLACK)
+
+        slack.send_async.assert_awaited_once()
+        assert not service._coalesce_buffers
+        await service.close()
+
+    async def test_rajada_vira_uma_mensagem_no_close(self, service):
+        """Eventos na janela são enviados juntos quando o serviço é fechado"""
+        slack = service.providers[NotificationChannel.SLACK]
+        envios = [
+            asyncio.create_task(service._dispatch_channel(
+                f"evento_{i}", criar_evento(f"Processo {i}"), NotificationChannel.SLACK
+            ))
+            for i in range(3)
+        ]
+        await asyncio.sleep(0)
+
+        # Ainda na janela: nada enviado e nenhum resultado antecipado
+        slack.send_async.assert_not_called()
+        assert not any(envio.done() for envio in envios)
+
+        await service.close()
+
+        assert await asyncio.gather(*envios) == [True, True, True]
+        slack.send_async.assert_awaited_once()
+        attachment = slack.send_async.call_args.kwargs['attachments'][0]
+        assert [field['title'] for field in attachment['fields']] == [
+            "Processo 0", "Processo 1", "Processo 2"
+        ]
+        assert contar_logs(service, channel='slack', status='sent') == 3
+
+    async def test_falha_do_lote_chega_ao_chamador(self, service):
+        """Falha no envio do lote é o resultado de cada evento agrupado"""
+        slack = service.providers[NotificationChannel.SLACK]
+        slack.send_async.return_value = False
+        envios = [
+            asyncio.create_task(service._dispatch_channel(
+                f"evento_{i}", criar_evento(f"P{i}"), NotificationChannel.SLACK
+            ))
+            for i in range(2)
+        ]
+        await asyncio.sleep(0)
+
+        await service.close()
+
+        assert await asyncio.gather(*envios) == [False, False]
+        assert contar_logs(service, channel='slack', status='failed') == 2
+
+    async def test_evento_unico_enviado_sem_agrupar(self, service):
+        """Um único evento na janela sai como mensagem normal"""
+        discord = service.providers[NotificationChannel.DISCORD]
+        envio = asyncio.create_task(service._dispatch_channel(
+            "evento", criar_evento("Sozinho"), NotificationChannel.DISCORD
+        ))
+        await asyncio.sleep(0)
+
+        await service.close()
+
+        assert await envio is True
+        discord.send_async.assert_awaited_once()
+        kwargs = discord.send_async.call_args.kwargs
+        assert kwargs['title'] == "INFO: Sozinho"
+        assert kwargs['description'] == "Mensagem de Sozinho"
+        assert contar_logs(service, channel='discord') == 1
+
+    async def test_lote_cheio_enviado_imediatamente(self, service):
+        """Buffer que atinge coalesce_max_batch é enviado sem esperar a janela"""
+        service.coalesce_max_batch = 2
+        slack = service.providers[NotificationChannel.SLACK]
+
+        resultados = await asyncio.gather(*(
+            service._dispatch_channel(f"evento_{i}", criar_evento(f"P{i}"), NotificationChannel.SLACK)
+            for i in range(2)
+        ))
+
+        assert resultados == [True, True]
+        assert not service._coalesce_buffers
+        assert not service._coalesce_timers
+        slack.send_async.assert_awaited_once()
+        assert len(slack.send_async.call_args.kwargs['attachments'][0]['fields']) == 2
+        await service.close()
+
+    async def test_urgente_nao_espera(self, service):
+        """Eventos URGENT são enviados na hora"""
+        slack = service.providers[NotificationChannel.SLACK]
+        evento = criar_evento("Urgente", priority=NotificationPriority.URGENT)
+
+        await service._dispatch_channel("evento", evento, NotificationChannel.SLACK)
+
+        slack.send_async.assert_awaited_once()
+        assert not service._coalesce_buffers
+        await service.close()
+
+
+class TestConexoesPorEventLoop:
+    """Testes da sessão HTTP e do pool SMTP em execuções com loops distintos"""
+
+    def test_sessao_http_recriada_em_novo_loop(self, tmp_path):
+        """Cada asyncio.run recebe uma sessão própria; a anterior é fechada"""
+        service = NotificationService(f"sqlite:///{tmp_path / 'notifications.db'}")
+
+        async def obter_sessao():
+            sessao = service._get_http_session()
+            assert service._get_http_session() is sessao
+            return sessao
+
+        primeira = asyncio.run(obter_sessao())
+
+        async def segunda_execucao():
+            sessao = await obter_sessao()
+            await asyncio.sleep(0)
+            assert primeira.closed
+            await service.close()
+            return sessao
+
+        segunda = asyncio.run(segunda_execucao())
+
+        assert segunda is not primeira
+        assert segunda.closed
+
+    def test_pool_smtp_descartado_em_novo_loop(self):
+        """Conexão SMTP aberta em um asyncio.run não é reutilizada em outro"""
+        provider = EmailProvider()
+        clientes = []
+
+        async def abrir():
+            cliente = MagicMock(is_connected=True)
+            cliente.quit = AsyncMock()
+            clientes.append(cliente)
+            return cliente
+
+        provider._open_connection = abrir
+
+        async def usar_conexao():
+            async with provider.connection() as cliente:
+                pass
+            async with provider.connection() as reutilizado:
+                assert reutilizado is cliente
+
+        asyncio.run(usar_conexao())
+        asyncio.run(usar_conexao())
+
+        assert len(clientes) == 2
+        clientes[0].close.assert_called_once()
+        clientes[1].close.assert_not_called()
+
+        asyncio.run(provider.close())
+
+        clientes[1].close.assert_called_once()
+        assert not provider._pool
+
+
+@pytest.mark.asyncio
+class TestLogsEmLote:
+    """Testes da gravação em lote dos logs de envio"""
+
+    async def test_logs_acumulados_ate_o_flush(self, service):
+        """Logs ficam no buffer até atingir o tamanho do lote"""
+        service.log_flush_interval_s = 3600
+        service.log_flush_size = 3
+        for i in range(2):
+            service._log_notification(f"evento_{i}", criar_evento(), NotificationChannel.DATABASE, True)
+
+        assert contar_logs(service) == 0
+
+        service._log_notification("evento_2", criar_evento(), NotificationChannel.DATABASE, False)
+
+        assert contar_logs(service) == 3
+        assert contar_logs(service, status='failed') == 1
+        assert not service._log_buffer
+        await service.close()
+
+    async def test_flush_em_segundo_plano(self, service):
+        """Logs pendentes são gravados após o intervalo sem novos envios"""
+        service.log_flush_interval_s = 0.05
+        service._log_notification("evento", criar_evento(), NotificationChannel.DATABASE, True)
+
+        assert contar_logs(service) == 0
+
+        await asyncio.sleep(0.2)
+
+        assert contar_logs(service) == 1
+        assert not service._log_buffer
+        await service.close()
+        assert service._log_flush_task is None
+
+    async def test_estatisticas_incluem_buffer(self, service):
+        """get_notification_stats grava os logs pendentes antes de consultar"""
+        service.log_flush_interval_s = 3600
+        service._log_notification("evento", criar_evento(), NotificationChannel.DATABASE, True)
+
+        stats = service.get_notification_stats(days=1)
+
+        assert stats['total'] == 1
+        assert stats['sent'] == 1
+        await service.close()
+
+    async def test_close_grava_pendentes(self, service):
+        """close() grava os logs que ainda estão no buffer"""
+        service.log_flush_interval_s = 3600
+        service._log_notification("evento", criar_evento(), NotificationChannel.DATABASE, True)
+
+        await service.close()
+
+        assert contar_logs(service) == 1
+
+
+class TestLogsAoFimDoLoop:
+    """Testes da gravação dos logs quando o event loop termina"""
+
+    def test_fim_do_asyncio_run_grava_pendentes(self, service):
+        """Sem close(), o cancelamento da task no fim do asyncio.run grava os logs"""
+        service.log_flush_interval_s = 3600
+
+        async def enviar():
+            service._log_notification("evento", criar_evento(), NotificationChannel.DATABASE, True)
+
+        asyncio.run(enviar())
+
+        assert contar_logs(service) == 1
@@ -0,0 +1,200 @@
+"""
+🧪 TESTES UNITÁRIOS - PROCESSADOR DE PDF
+Abertura mapeada em memória e extração de texto por página
+"""
+
+import pytest
+import json
+import zlib
+from pathlib import Path
+import sys
+
+# Adicionar diretório raiz ao path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+pytest.importorskip("PyPDF2")
+
+from src.mcp_integration import pdf_processor
+from src.mcp_integration.pdf_processor import PDFProcessor
+
+
+FONTE_HELVETICA = b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+
+
+def montar_pdf(streams, comprimir=False, fonte=FONTE_HELVETICA) -> bytes:
+    """PDF mínimo de uma página cujo /Contents tem os streams dados (array se mais de um)"""
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+    ]
+    refs = b" ".join(b"%d 0 R" % (5 + i) for i in range(len(streams)))
+    contents = refs if len(streams) == 1 else b"[" + refs + b"]"
+    objetos.append(
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /Font << /F1 4 0 R >> >> /Contents " + contents + b" >>"
+    )
+    objetos.append(fonte)
+    for stream in streams:
+        dados = zlib.compress(stream) if comprimir else stream
+        filtro = b" /Filter /FlateDecode" if comprimir else b""
+        objetos.append(
+            b"<< /Length %d%s >>\nstream\n" % (len(dados), filtro) + dados + b"\nendstream"
+        )
+
+    saida = b"%PDF-1.4\n"
+    offsets = []
+    for i, objeto in enumerate(objetos):
+        offsets.append(len(saida))
+        saida += b"%d 0 obj\n" % (i + 1) + objeto + b"\nendobj\n"
+
+    xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    saida += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    saida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, xref)
+    return saida
+
+
+STREAMS_DUPLOS = [
+    b"BT /F1 12 Tf 72 700 Td (Primeira parte) Tj ET",
+    b"BT /F1 12 Tf 72 680 Td (Segunda parte) Tj ET",
+]
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    """Processador com cache_dir num diretório temporário"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    return PDFProcessor()
+
+
+class TestAberturaMmap:
+    """Testes da abertura do PDF mapeado em memória"""
+
+    def test_extracao_com_metadados(self, processor, tmp_path):
+        """Texto e metadados lidos pelo PdfReader sobre o mmap"""
+        pdf = tmp_path / "simples.pdf"
+        pdf.write_bytes(montar_pdf([b"BT /F1 12 Tf 72 700 Td (Pagina unica) Tj ET"], comprimir=True))
+
+        resultado = processor.extract_text_simple(pdf)
+
+        assert resultado['success']
+        assert resultado['pages'] == [1]
+        assert resultado['texts'] == ['Pagina unica']
+        assert resultado['metadata']['pages'] == 1
+        assert resultado['metadata']['size'] == pdf.stat().st_size
+
+    def test_arquivo_vazio(self, processor, tmp_path):
+        """Arquivo vazio (não mapeável) vira erro, não exceção"""
+        pdf = tmp_path / "vazio.pdf"
+        pdf.write_bytes(b"")
+
+        resultado = processor.extract_text_simple(pdf)
+
+        assert resultado['success'] is False
+        assert resultado['error']
+
+    def test_arquivo_inexistente(self, processor, tmp_path):
+        """Caminho inexistente vira erro, não exceção"""
+        resultado = processor.extract_text_simple(tmp_path / "nao_existe.pdf")
+
+        assert resultado['success'] is False
+
+
+class TestPaginasPesadas:
+    """Testes da leitura rápida dos operadores de texto em páginas pesadas"""
+
+    @pytest.fixture
+    def pagina_pesada(self, monkeypatch):
+        """Qualquer página conta como pesada"""
+        monkeypatch.setattr(pdf_processor, '_HEAVY_CONTENT_STREAM_BYTES', 10)
+
+    def test_varios_streams(self, processor, tmp_path):
+        """/Contents como array: o texto de todos os streams é extraído"""
+        pdf = tmp_path / "multi.pdf"
+        pdf.write_bytes(montar_pdf(STREAMS_DUPLOS))
+
+        resultado = processor.extract_text_simple(pdf)
+
+        assert resultado['success']
+        assert resultado['pages'] == [1]
+        assert 'Primeira parte' in resultado['texts'][0]
+        assert 'Segunda parte' in resultado['texts'][0]
+
+    def test_varios_streams_pagina_pesada(self, processor, tmp_path, pagina_pesada):
+        """Caminho rápido concatena os streams do array"""
+        pdf = tmp_path / "pesado.pdf"
+        pdf.write_bytes(montar_pdf(STREAMS_DUPLOS, comprimir=True))
+
+        resultado = processor.extract_text_simple(pdf)
+
+        assert resultado['texts'] == ['Primeira parte Segunda parte']
+
+    def test_string_hexadecimal_usa_extracao_padrao(self, processor, tmp_path, pagina_pesada):
+        """Texto em strings <...> não é descartado pela varredura rápida"""
+        pdf = tmp_path / "hex.pdf"
+        pdf.write_bytes(montar_pdf([
+            b"BT /F1 12 Tf 72 700 Td (Literal) Tj 0 -20 Td <48657861> Tj ET"
+        ]))
+
+        texto = processor.extract_text_simple(pdf)['texts'][0]
+
+        assert 'Literal' in texto
+        assert 'Hexa' in texto
+
+    def test_codificacao_com_differences_usa_extracao_padrao(self, processor, tmp_path, pagina_pesada):
+        """Fonte com /Differences não é lida byte a byte"""
+        fonte = (
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding "
+            b"<< /Type /Encoding /BaseEncoding /WinAnsiEncoding /Differences [65 /B] >> >>"
+        )
+        pdf = tmp_path / "differences.pdf"
+        pdf.write_bytes(montar_pdf([b"BT /F1 12 Tf 72 700 Td (ABA) Tj ET"], fonte=fonte))
+
+        assert processor.extract_text_simple(pdf)['texts'] == ['BBB']
+
+    def test_falha_na_medicao_usa_extracao_padrao(self, processor, tmp_path, monkeypatch):
+        """Se a leitura dos streams falhar, a página sai pelo extract_text"""
+        def falhar(page):
+            raise ValueError("estrutura inesperada")
+
+        monkeypatch.setattr(pdf_processor, '_content_streams', falhar)
+        pdf = tmp_path / "fallback.pdf"
+        pdf.write_bytes(montar_pdf(STREAMS_DUPLOS))
+
+        resultado = processor.extract_text_simple(pdf)
+
+        assert resultado['success']
+        assert 'Primeira parte' in resultado['texts'][0]
+
+
+class TestTextoCompleto:
+    """Testes do texto completo montado sob demanda"""
+
+    def test_resultado_e_dict_simples(self, processor, tmp_path):
+        """O resultado não traz chaves calculadas e serializa como JSON"""
+        pdf = tmp_path / "multi.pdf"
+        pdf.write_bytes(montar_pdf(STREAMS_DUPLOS))
+
+        resultado = processor.extract_text_simple(pdf)
+
+        assert type(resultado) is dict
+        assert 'total_text' not in resultado
+        assert json.loads(json.dumps(resultado))['texts'] == resultado['texts']
+
+    def test_total_text_une_paginas(self):
+        """total_text junta os textos das páginas"""
+        resultado = {'success': True, 'pages': [1, 2], 'texts': ['um', 'dois']}
+
+        assert PDFProcessor.total_text(resultado) == 'um\n\ndois'
+
+    def test_preview_usa_texto_completo(self, processor, tmp_path):
+        """get_pdf_preview trunca o texto completo"""
+        pdf = tmp_path / "preview.pdf"
+        pdf.write_bytes(montar_pdf(STREAMS_DUPLOS))
+
+        preview = processor.get_pdf_preview(pdf, max_chars=8)
+
+        assert preview['preview'].startswith('Primeira')
+        assert preview['has_more'] is True
+        assert preview['total_length'] > 8